@@ -3,7 +3,17 @@
 
 ## TODO : Actually work in all the built ins, real ans, and fake ans
 
+## To quiz from a question bank file instead of the lists below:
+##     python quiz.py questions.csv     (or questions.json)
+## CSV rows are: builtin, real answer, fake answer, fake answer, fake answer
+## and the first row can be a header starting with "builtin"
+## JSON is a list of those rows, or of objects like
+##     {"builtin": ..., "answer": ..., "fakes": [..., ..., ...]}
+
+import csv
+import json
 import random
+import sys
 
 # Identify all Built-ins
 reals = [
@@ -19,36 +29,81 @@ fakes = [
          ["AttributeError","A","B","C"],
         ]
 
-# Do the quiz
-
-## Ask how many questions the quiz will be and initialize grading scheme
-numQs = int(input(
-         "\nHow many questions would you like to answer? (enter a number):\t"
-        ) ) 
-numCorrect = 0
-numIncorrect = 0
-
-## Actually administer the quiz
-for i in range(numQs):
-    randomNum = random.randint(0, len(fakes)-1)
-    testedBuiltIn = reals[randomNum][0]
-    potentialAnswers = [reals[randomNum][1], fakes[randomNum][1],
-                        fakes[randomNum][2], fakes[randomNum][3] ]
-    random.shuffle(potentialAnswers)
-    letters = {"A":0, "B":1, "C":2, "D":3}
-    print("Question {0}: What is {1}?".format(i, testedBuiltIn))
-    for key, value in letters.items():
-        print(f"""\t{key}: {potentialAnswers[value]}""") 
-    answer = input("Your Answer? (type the letter)\t").strip().upper()
-    if potentialAnswers[letters[answer]] == reals[randomNum][1]:
-        numCorrect += 1
-    else: 
-        numIncorrect += 1
-    reals.pop(randomNum)
-    fakes.pop(randomNum)
-
-# Output Results
-print("\n ~~~~ Quiz Complete ~~~~ \n")
-print("You got {0} correct out of {1}".format(numCorrect, numQs))
-print("Your final score is {0}%".format(numCorrect/numQs*100))
-print("Thanks for playing!\n")
+def loadQuestions(fileName):
+    """Read a question bank into a list of (builtin, real answer, fake answer,
+    fake answer, fake answer) records. A CSV header row (first field
+    "builtin") and rows that don't have all five fields are skipped."""
+    with open(fileName, newline="") as bankFile:
+        if fileName.lower().endswith(".json"):
+            rows = json.load(bankFile)
+        else:
+            rows = csv.reader(bankFile)
+        bank = []
+        for lineNum, row in enumerate(rows):
+            if isinstance(row, dict):
+                row = [row["builtin"], row["answer"], *row["fakes"]]
+            elif lineNum == 0 and row and str(row[0]).strip().lower() == "builtin":
+                continue
+            if len(row) == 5:
+                bank.append(tuple(row))
+    return bank
+
+def drawQuestions(bank):
+    """Yield the questions of the bank in a random order without repeats.
+    This is a Fisher-Yates shuffle done one draw at a time: position i is
+    swapped with a random later position, but the swaps are kept in a dict
+    instead of being done on the bank, so the bank isn't changed or copied
+    and each draw is O(1) however big the bank is."""
+    swapped = {}
+    for i in range(len(bank)):
+        j = random.randint(i, len(bank)-1)
+        pick = swapped.get(j, j)
+        swapped[j] = swapped.get(i, i)
+        yield bank[pick]
+
+if __name__ == "__main__":
+    ## Build the question bank
+    if len(sys.argv) > 1:
+        bank = loadQuestions(sys.argv[1])
+    else:
+        bank = [(real[0], real[1], *fake[1:]) for real, fake in zip(reals, fakes)]
+
+    if not bank:
+        sys.exit("There are no questions to ask!")
+
+    # Do the quiz
+
+    ## Ask how many questions the quiz will be and initialize grading scheme
+    numQs = int(input(
+             "\nHow many questions would you like to answer? (enter a number):\t"
+            ) )
+    if numQs > len(bank):
+        print("There are only {0} questions, so that's how many you get".format(len(bank)))
+        numQs = len(bank)
+    if numQs <= 0:
+        print("No questions, no quiz. Thanks for playing!")
+        sys.exit()
+    numCorrect = 0
+    numIncorrect = 0
+
+    ## Actually administer the quiz
+    questions = drawQuestions(bank)
+    for i in range(numQs):
+        testedBuiltIn, realAnswer, *fakeAnswers = next(questions)
+        potentialAnswers = [realAnswer, *fakeAnswers]
+        random.shuffle(potentialAnswers)
+        letters = {"A":0, "B":1, "C":2, "D":3}
+        print("Question {0}: What is {1}?".format(i, testedBuiltIn))
+        for key, value in letters.items():
+            print(f"""\t{key}: {potentialAnswers[value]}""")
+        answer = input("Your Answer? (type the letter)\t").strip().upper()
+        if answer in letters and potentialAnswers[letters[answer]] == realAnswer:
+            numCorrect += 1
+        else:
+            numIncorrect += 1
+
+    # Output Results
+    print("\n ~~~~ Quiz Complete ~~~~ \n")
+    print("You got {0} correct out of {1}".format(numCorrect, numQs))
+    print("Your final score is {0}%".format(numCorrect/numQs*100))
+    print("Thanks for playing!\n")
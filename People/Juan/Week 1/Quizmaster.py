@@ -1,35 +1,187 @@
 #!/usr/bin/env python3
 
 from datetime import datetime
+from functools import lru_cache
+import hashlib
+import marshal
 import pytz
 from random import choice
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 import os
+import sys
 import time
 
 
-def build_dict(f_name: str) -> Dict[str, str]:
+# Bump when the layout of the description cache changes
+CACHE_VERSION = 1
+
+
+def build_dict(f_name: str, use_cache: bool = True) -> Dict[str, str]:
 	"""
 	builds a dictionary mapping builtins to their descriptions from the passed
-	in file.
+	in file. Each line is "<builtin> : <description>"; only the first " : "
+	separates the two, so descriptions may contain it too. Lines without a
+	separator are skipped.
+
+	The mapping is also saved to a binary cache next to the file, which is
+	reused as long as the file's mtime and size, or failing that its hash,
+	haven't changed.
 
 	Args:
 		f_name : name of file containing descriptions of builitins
+		use_cache : read and write the binary cache
+
+	Returns:
+		dict{str: str}:
+			maps builtins to their descriptions
+	"""
+	if not use_cache:
+		with open(f_name, "r") as descriptions:
+			return parse_descriptions(descriptions.read())
+
+	cache_name = os.path.join(
+		os.path.dirname(f_name),
+		f".{os.path.basename(f_name)}.cache"
+	)
+	stat = os.stat(f_name)
+	cached = read_cache(cache_name)
+	if cached is not None and (cached["mtime"], cached["size"]) == (stat.st_mtime_ns, stat.st_size):
+		return cached["descriptions"]
+
+	with open(f_name, "rb") as descriptions:
+		raw = descriptions.read()
+	digest = hashlib.sha1(raw).digest()
+	if cached is not None and cached["hash"] == digest:
+		# Same contents, just touched. Refresh the stamp so the hash isn't needed next time
+		desc_dict = cached["descriptions"]
+	else:
+		desc_dict = parse_descriptions(raw.decode())
+	write_cache(cache_name, {
+		"version": CACHE_VERSION,
+		"mtime": stat.st_mtime_ns,
+		"size": stat.st_size,
+		"hash": digest,
+		"descriptions": desc_dict
+	})
+	return desc_dict
+
+
+def parse_descriptions(text: str) -> Dict[str, str]:
+	"""
+	Parses the contents of a description file in a single pass
+	Args:
+		text : contents of a file with lines formatted "<builtin> : <description>"
 
 	Returns:
 		dict{str: str}:
 			maps builtins to their descriptions
 	"""
 	desc_dict = {}
-	lens = []
-	with open(f_name, "r") as descriptions:
-		for i, line in enumerate(descriptions):
-			ln_1, ln_2 = line.split(" : ")
-			ln_2 = ln_2.replace("\n", "")
-			desc_dict.update({ln_1: ln_2})
+	for line in text.splitlines():
+		bltin, sep, desc = line.partition(" : ")
+		if sep:
+			desc_dict[bltin] = desc
 	return desc_dict
 
 
+def read_cache(cache_name: str) -> Optional[dict]:
+	"""
+	Loads a description cache written by write_cache
+	Args:
+		cache_name : path of the cache file
+
+	Returns:
+		the cached entry, or None if it is missing, unreadable or out of date
+	"""
+	try:
+		with open(cache_name, "rb") as cache:
+			cached = marshal.loads(cache.read())
+	except (OSError, EOFError, ValueError, TypeError):
+		return None
+	if not isinstance(cached, dict) or cached.get("version") != CACHE_VERSION:
+		return None
+	return cached
+
+
+def write_cache(cache_name: str, cached: dict):
+	"""
+	Saves a description cache, replacing any old one in a single step so a
+	crash can't leave half a cache behind
+	Args:
+		cache_name : path of the cache file
+		cached : entry to save, see build_dict
+	"""
+	tmp_name = cache_name + ".tmp"
+	try:
+		with open(tmp_name, "wb") as cache:
+			marshal.dump(cached, cache)
+		os.replace(tmp_name, cache_name)
+	except OSError:
+		# The cache is only a speedup, e.g. the directory may be read-only
+		pass
+
+
+# format is "\033[1;<text_color_code>;<background_color_code>m <text>"
+# Text colors
+T_BLACK, T_RED, T_GREEN, T_YELLOW, T_BLUE, T_PURPLE, T_CYAN, T_WHITE = range(30, 38)
+# background colors are the text colors shifted by 10
+B_BLACK, B_RED, B_GREEN, B_YELLOW, B_BLUE, B_PURPLE, B_CYAN, B_WHITE = range(40, 48)
+RESET = "\033[0m"
+
+
+def build_palette(t_colors: List[int], b_colors: List[int], shift: int) -> Tuple[str, ...]:
+	"""
+	Precomputes the escape sequence that starts each line of a palette. Line i
+	uses text color i and the background color shift places further along
+	Args:
+		t_colors : text color codes to cycle through
+		b_colors : background color codes to cycle through
+		shift : offset of the background colors from the text colors
+
+	Returns:
+		escape sequences, one per color
+	"""
+	n_colors = len(t_colors)
+	return tuple(
+		f"\033[1;{t_colors[i]};{b_colors[(i+shift) % n_colors]}m "
+		for i in range(n_colors)
+	)
+
+
+RAINBOW = build_palette(
+	[T_RED, T_YELLOW, T_GREEN, T_BLUE, T_PURPLE],
+	[B_RED, B_YELLOW, B_GREEN, B_BLUE, B_PURPLE],
+	shift=2
+)
+DWIGHT = build_palette(
+	[T_YELLOW, T_WHITE, T_GREEN],
+	[B_BLACK, B_BLUE, B_PURPLE],
+	shift=1
+)
+
+
+@lru_cache(maxsize=4096)
+def paint(message: str, palette: Tuple[str, ...], start: int) -> str:
+	"""
+	Colors each line of message with the palette, starting from color start.
+	Cached since the quiz prints the same prompts over and over.
+	Args:
+		message : string to be formatted
+		palette : escape sequences from build_palette
+		start : index of the palette color for the first line
+
+	Returns:
+		formatted message
+	"""
+	n_colors = len(palette)
+	painted = "\n".join([
+		palette[(i+start) % n_colors] + slc
+		for i, slc in enumerate(message.split("\n"))
+	])
+	# drops the last character of the message like the formatters always have
+	return painted[:-1] + RESET
+
+
 def format_the_rainbow(message: str) -> str:
 	"""
 	Formats the message with escape sequences to make it very pretty on the output
@@ -39,39 +191,7 @@ def format_the_rainbow(message: str) -> str:
 	Returns:
 		rainbow-fied message
 	"""
-
-	# format is "\033[1;<text_color_code>;<background_color_code>m <text>"
-	# Text colors
-	t_black = "30"
-	t_red = "31"
-	t_green = "32"
-	t_yellow = "33"
-	t_blue = "34"
-	t_purple = "35"
-	t_cyan = "36"
-	t_white = "37"
-
-	# background colors
-	b_red = f"{31+10}"
-	b_green = f"{32+10}"
-	b_yellow = f"{33+10}"
-	b_blue = f"{34+10}"
-	b_purple = f"{35+10}"
-	b_cyan = f"{36+10}"
-	b_white = f"{37+10}"
-
-	t_rainbow = [t_red, t_yellow, t_green, t_blue, t_purple]
-	b_rainbow = [b_red, b_yellow, b_green, b_blue, b_purple]
-	rain_l = len(t_rainbow)
-
-	g_message = ""
-	shift = 2
-	start = choice(range(rain_l))
-	for i, slc in enumerate(message.split("\n")):
-		col = t_rainbow[(i+start) % rain_l]
-		bg = b_rainbow[(i+start+shift) % rain_l]
-		g_message += f"\033[1;{col};{bg}m {slc}\n"
-	return g_message[:-2] + "\033[0m"
+	return paint(message, RAINBOW, choice(range(len(RAINBOW))))
 
 
 def formatted_for_synergy(message: str) -> str:
@@ -83,42 +203,38 @@ def formatted_for_synergy(message: str) -> str:
 	Returns:
 		synergistic message
 	"""
-	# format is "\033[1;<text_color_code>;<background_color_code>m <text>"
-	# Text colors
-	t_black = "30"
-	t_red = "31"
-	t_green = "32"
-	t_yellow = "33"
-	t_blue = "34"
-	t_purple = "35"
-	t_cyan = "36"
-	t_white = "37"
-
-	# background colors
-	b_black = f"{30+10}"
-	b_red = f"{31+10}"
-	b_green = f"{32+10}"
-	b_yellow = f"{33+10}"
-	b_blue = f"{34+10}"
-	b_purple = f"{35+10}"
-	b_cyan = f"{36+10}"
-	b_white = f"{37+10}"
-
-	t_dwight = [t_yellow, t_white, t_green]
-	b_dwight = [b_black, b_blue, b_purple]
-	rain_l = len(t_dwight)
-
-	g_message = ""
-	shift = 1
-	start = choice(range(rain_l))
-	for i, slc in enumerate(message.split("\n")):
-		col = t_dwight[(i+start) % rain_l]
-		bg = b_dwight[(i+start+shift) % rain_l]
-		g_message += f"\033[1;{col};{bg}m {slc}\n"
-	return g_message[:-2] + "\033[0m"
-
-
-def quiz(des_dict: Dict[str, str], ques: int = 10, prompt_desc: bool = True, passing: float = .8):
+	return paint(message, DWIGHT, choice(range(len(DWIGHT))))
+
+
+def no_formatting(message: str) -> str:
+	"""
+	Leaves the message alone, for output that isn't a terminal
+	Args:
+		message : string to be formatted
+
+	Returns:
+		message
+	"""
+	return message
+
+
+def use_color() -> bool:
+	"""
+	determines if output should be colored: only when stdout is a terminal and
+	the NO_COLOR environment variable isn't set
+	Returns:
+		True if output should be colored, False otherwise
+	"""
+	return sys.stdout.isatty() and "NO_COLOR" not in os.environ
+
+
+def quiz(
+		des_dict: Dict[str, str],
+		ques: int = 10,
+		prompt_desc: bool = True,
+		passing: float = .8,
+		color: Optional[bool] = None
+):
 	"""
 	Function should pop up a new terminal which formats a quiz, asking the player
 	to select from four options (A, B, C, or D).
@@ -132,9 +248,15 @@ def quiz(des_dict: Dict[str, str], ques: int = 10, prompt_desc: bool = True, pas
 	Should be insensitive to case.
 	Once all of the questions have been answered the quiz gives the player their
 	score and either complements them or berates them.
+	Output is colored if color is True, or when color is None and use_color()
+	says so.
 	"""
+	if color is None:
+		color = use_color()
+	if not color:
+		formatter = no_formatting
 	# determine if it's June:
-	if is_it_june():
+	elif is_it_june():
 		formatter = format_the_rainbow
 	else:
 		formatter = formatted_for_synergy
@@ -252,5 +374,5 @@ def is_it_june() -> bool:
 
 if __name__ == '__main__':
 	descriptions = build_dict("builtins.txt")
-	quiz(descriptions, ques=10)
+	quiz(descriptions, ques=10, color=False if "--no-color" in sys.argv else None)
 
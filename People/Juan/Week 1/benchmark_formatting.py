@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+from random import choice
+import time
+
+from Quizmaster import format_the_rainbow, formatted_for_synergy, no_formatting, paint
+
+
+def old_rainbow(message: str) -> str:
+	"""
+	format_the_rainbow as it was before the palette was precomputed, for
+	comparison
+	"""
+	t_rainbow = ["31", "33", "32", "34", "35"]
+	b_rainbow = [f"{31+10}", f"{33+10}", f"{32+10}", f"{34+10}", f"{35+10}"]
+	rain_l = len(t_rainbow)
+
+	g_message = ""
+	shift = 2
+	start = choice(range(rain_l))
+	for i, slc in enumerate(message.split("\n")):
+		col = t_rainbow[(i+start) % rain_l]
+		bg = b_rainbow[(i+start+shift) % rain_l]
+		g_message += f"\033[1;{col};{bg}m {slc}\n"
+	return g_message[:-2] + "\033[0m"
+
+
+def bench_formatting(n_lines: int = 100_000, n_messages: int = 50):
+	"""
+	Times formatting n_lines messages, drawn from n_messages distinct quiz
+	prompts like the quiz prints
+	Args:
+		n_lines : number of messages to format
+		n_messages : number of distinct messages
+	"""
+	messages = [
+		f"Question {i} : some builtin description\nA) abs\nB) all\nC) any\nD) ascii\nYour answer? :"
+		for i in range(n_messages)
+	]
+	lines = [messages[i % n_messages] for i in range(n_lines)]
+
+	print(f"Formatting {n_lines} messages")
+	for name, formatter in [
+		("old rainbow", old_rainbow),
+		("rainbow", format_the_rainbow),
+		("synergy", formatted_for_synergy),
+		("no color", no_formatting),
+	]:
+		paint.cache_clear()
+		start = time.perf_counter()
+		for line in lines:
+			formatter(line)
+		elapsed = time.perf_counter() - start
+		print(f"  {name:12}: {1e9 * elapsed / n_lines:8.0f} ns/message")
+
+
+if __name__ == '__main__':
+	bench_formatting()
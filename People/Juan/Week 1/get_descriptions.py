@@ -1,41 +1,108 @@
 #!/usr/bin/env python3
 
+import argparse
+import builtins
+import sys
+from typing import Iterable, List, Set, Optional
 
-def set_desc(f_nm: str) -> str:
+
+def described_names(lines: Iterable[str]) -> Set[str]:
+	"""
+	Collects the names that already have a description in a single pass
+	:param lines: lines formatted "item : description"
+	:return: set of the items
+	"""
+	names = set()
+	for ln in lines:
+		name, sep, _ = ln.partition(" : ")
+		if sep:
+			names.add(name)
+	return names
+
+
+def missing_names(lines: Iterable[str], names: Optional[Iterable[str]] = None) -> List[str]:
+	"""
+	Finds the names that don't have a description yet
+	:param lines: lines formatted "item : description"
+	:param names: names that should be described, dir(builtins) by default
+	:return: the undescribed names, in the order given
+	"""
+	if names is None:
+		names = dir(builtins)
+	described = described_names(lines)
+	return [name for name in names if name not in described]
+
+
+def read_descriptions(lines: Iterable[str]) -> dict:
 	"""
-	Prompts the user for a description of each line in fname, appends the user
-	input to that line
+	Reads descriptions to fill in from lines formatted "item : description".
+	Lines without a separator or with an empty description are ignored.
+	:param lines: lines to read
+	:return: dict mapping items to their descriptions
+	"""
+	descriptions = {}
+	for ln in lines:
+		name, sep, desc = ln.rstrip("\n").partition(" : ")
+		if sep and desc:
+			descriptions[name.strip()] = desc
+	return descriptions
+
+
+def set_desc(f_nm: str, source: Optional[Iterable[str]] = None) -> str:
+	"""
+	Appends a description for each builtin that doesn't have one in f_nm yet.
+	Descriptions are taken from source if given, otherwise the user is
+	prompted for each one. All new lines are written to f_nm at once when
+	done, including when the user quits early with EOF or Ctrl-C.
 	:param f_nm: file where each line is formatted "item : *"
+	:param source: lines formatted "item : description" to fill in from
+		without prompting, e.g. another file or sys.stdin
 	:return: f_nm
 	"""
-	bltins = dir(__builtins__)
 	skp = "S"
 	with open(f_nm, "r") as f:
 		lines = f.readlines()
-	with open(f_nm, "a+") as f:
-		print(f"Fill out what you can, type {skp} to skip")
-		while len(bltins) > 0:
-			for blt in bltins:
-				for ln in lines:
-					if blt in ln:
-						lines.remove(ln)
-						bltins.remove(blt)
-						blt = None
-						break
+	todo = missing_names(lines)
+
+	new_lines = []
+	try:
+		if source is not None:
+			descriptions = read_descriptions(source)
+			for blt in todo:
+				if blt in descriptions:
+					new_lines.append(f"{blt} : {descriptions[blt]}\n")
+		else:
+			print(f"Fill out what you can, type {skp} to skip")
+			for blt in todo:
 				try:
-					if blt is None:
-						continue
 					desc = input(f"{blt} : ")
 				except EOFError:
-					return f_nm
+					break
 				if desc == skp:
 					continue
-				ln = f"{blt} : {desc}\n"
-				f.write(ln)
-				bltins.remove(blt)
+				new_lines.append(f"{blt} : {desc}\n")
+	finally:
+		# Save what was collected even if the user quits with Ctrl-C
+		if new_lines:
+			with open(f_nm, "a") as f:
+				# Don't glue the first new line onto an unterminated last line
+				if lines and not lines[-1].endswith("\n"):
+					f.write("\n")
+				f.write("".join(new_lines))
 	return f_nm
 
 
 if __name__ == '__main__':
-	fname = "builtins.txt"
-	set_desc(fname)
+	parser = argparse.ArgumentParser(description="Describe the python builtins")
+	parser.add_argument("fname", nargs="?", default="builtins.txt",
+		help="file of descriptions to add to")
+	parser.add_argument("--fill-from", metavar="FILE",
+		help="take descriptions from FILE (- for stdin) instead of prompting")
+	args = parser.parse_args()
+	if args.fill_from == "-":
+		set_desc(args.fname, sys.stdin)
+	elif args.fill_from:
+		with open(args.fill_from, "r") as source:
+			set_desc(args.fname, source)
+	else:
+		set_desc(args.fname)
@@ -0,0 +1,213 @@
+# Benchmarks for the quizmaster internals
+
+import asyncio
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+from quizmaster import CACHE_DIR, LETTERS, Quiz, render_text, run_sessions
+from quiz_server import load_test
+
+def make_quiz(num_keywords):
+    """
+    Make a Quiz with a large fake quiz bank without starting it.
+
+    :param num_keywords: int, the size of the quiz bank
+    :return: quiz: a Quiz instance that has not been started
+    """
+    quiz = Quiz.__new__(Quiz)
+    quiz.quiz_info = {"keyword{}".format(i): "definition number {}".format(i)
+                      for i in range(num_keywords)}
+    quiz._index_definitions()
+    return quiz
+
+def bench_wrong_answers(num_keywords=500000, num_questions=1000):
+    """
+    Compare choosing wrong answers with the distractor index against
+    rebuilding a weights list over the whole quiz bank for every question.
+
+    :param num_keywords: int, the size of the quiz bank
+    :param num_questions: int, the number of questions to time
+    """
+    quiz = make_quiz(num_keywords)
+    keywords = random.sample(list(quiz.quiz_info.keys()), num_questions)
+
+    start = time.perf_counter()
+    for keyword in keywords:
+        correct_answer = quiz.quiz_info[keyword]
+        weights = [1 if d != correct_answer else 0 for d in quiz.quiz_info.values()]
+        random.choices(list(quiz.quiz_info.values()), weights=weights, k=3)
+    weights_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for keyword in keywords:
+        quiz._choose_wrong_answers(quiz.quiz_info[keyword], 3)
+    index_time = time.perf_counter() - start
+
+    print("Choosing wrong answers from {} definitions".format(num_keywords))
+    print("  weights list     : {0:10.2f} us/question".format(1e6 * weights_time / num_questions))
+    print("  distractor index : {0:10.2f} us/question".format(1e6 * index_time / num_questions))
+    return
+
+def bench_hard_mode(num_keywords=20000, num_questions=1000):
+    """
+    Time building the neighbor index for hard mode and choosing wrong
+    answers from it.
+
+    :param num_keywords: int, the size of the quiz bank
+    :param num_questions: int, the number of questions to time
+    """
+    words = ["list", "string", "number", "error", "object", "return", "iterate",
+             "value", "type", "file", "raise", "call", "attribute", "module"]
+    quiz = Quiz.__new__(Quiz)
+    quiz.quiz_info = {"keyword{}".format(i): " ".join(random.choices(words, k=8)) + " {}".format(i)
+                      for i in range(num_keywords)}
+    quiz._index_definitions()
+
+    start = time.perf_counter()
+    quiz._index_neighbors()
+    build_time = time.perf_counter() - start
+
+    keywords = random.sample(list(quiz.quiz_info.keys()), num_questions)
+    start = time.perf_counter()
+    for keyword in keywords:
+        quiz._choose_wrong_answers(quiz.quiz_info[keyword], 3)
+    choose_time = time.perf_counter() - start
+
+    print("Hard mode with {} definitions".format(num_keywords))
+    print("  build neighbors : {0:10.2f} s".format(build_time))
+    print("  wrong answers   : {0:10.2f} us/question".format(1e6 * choose_time / num_questions))
+    return
+
+def bench_startup(num_runs=5):
+    """
+    Time starting up a builtins quiz in a fresh interpreter, with and without
+    the on-disk cache, and report the import time of quizmaster from
+    'python -X importtime'.
+
+    :param num_runs: int, the number of warm starts to average over
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    setup = "from quizmaster import Quiz; q = Quiz(auto_start=False); q.correct"
+
+    def run(code, *flags):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, *flags, "-c", code], cwd=here,
+                                capture_output=True, text=True, check=True)
+        return time.perf_counter() - start, result
+
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    cold_time, _ = run(setup)
+    warm_time = sum(run(setup)[0] for _ in range(num_runs)) / num_runs
+
+    # The last line of -X importtime output for the module is its cumulative time
+    _, result = run("import quizmaster", "-X", "importtime")
+    import_line = [l for l in result.stderr.splitlines() if l.endswith("| quizmaster")][-1]
+    import_us = int(import_line.split("|")[1])
+
+    print("Quiz startup")
+    print("  import quizmaster : {0:10.2f} ms".format(import_us / 1000))
+    print("  cold cache        : {0:10.2f} ms".format(1000 * cold_time))
+    print("  warm cache        : {0:10.2f} ms".format(1000 * warm_time))
+    return
+
+def bench_headless(num_sessions=5000, num_questions=10, workers=(1, 2, 4)):
+    """
+    Report questions/second for headless quiz sessions answered by random
+    guessing, in this process and in process pools of different sizes.
+
+    :param num_sessions: int, the number of sessions to run
+    :param num_questions: int, number of questions in each session
+    :param workers: tuple, the pool sizes to try
+    """
+    total_questions = num_sessions * num_questions
+    print("Headless quiz, {} sessions of {} questions".format(num_sessions, num_questions))
+
+    quiz = Quiz(auto_start=False)
+    start = time.perf_counter()
+    for _ in range(num_sessions):
+        quiz.run(lambda question: random.choice(LETTERS), num_questions)
+    elapsed = time.perf_counter() - start
+    print("  in process : {0:12.0f} questions/s".format(total_questions / elapsed))
+
+    for num_workers in workers:
+        start = time.perf_counter()
+        run_sessions(num_sessions, num_questions, workers=num_workers)
+        elapsed = time.perf_counter() - start
+        print("  {0} workers  : {1:12.0f} questions/s".format(num_workers, total_questions / elapsed))
+    return
+
+def bench_score_art(num_scores=2000, font='standard'):
+    """
+    Compare rendering quiz scores with Figlet.renderText every time against
+    composing them from cached glyphs.
+
+    :param num_scores: int, the number of scores to render
+    :param font: str, the pyfiglet font
+    """
+    import pyfiglet
+    fig = pyfiglet.Figlet(font=font)
+    scores = [(random.randint(0, 20), 20) for _ in range(num_scores)]
+
+    start = time.perf_counter()
+    for correct, total in scores:
+        fig.renderText("Score: ")
+        fig.renderText(str(correct))
+        fig.renderText("/")
+        fig.renderText(str(total))
+    figlet_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for correct, total in scores:
+        render_text("Score: ", font)
+        render_text("{0}/{1}".format(correct, total), font)
+    glyph_time = time.perf_counter() - start
+
+    print("Rendering {} scores".format(num_scores))
+    print("  renderText   : {0:10.2f} us/score".format(1e6 * figlet_time / num_scores))
+    print("  glyph cache  : {0:10.2f} us/score".format(1e6 * glyph_time / num_scores))
+    return
+
+def bench_server(num_sessions=1000, num_questions=10, port=8642):
+    """
+    Start the quiz server in its own process and report the p50 and p99
+    latency of questions across many concurrent sessions.
+
+    :param num_sessions: int, the number of concurrent users
+    :param num_questions: int, number of questions in each session
+    :param port: int, the port to run the server on
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    server = subprocess.Popen([sys.executable, "quiz_server.py", "serve", "--port", str(port),
+                               "--questions", str(num_questions)],
+                              cwd=here, stdout=subprocess.DEVNULL)
+    try:
+        # Wait for the server to start listening
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port)).close()
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.05)
+        results = asyncio.run(load_test('127.0.0.1', port, num_sessions))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print("Quiz server, {} concurrent sessions of {} questions".format(num_sessions, num_questions))
+    print("  throughput  : {0:10.0f} questions/s".format(results["questions"] / results["elapsed"]))
+    print("  p50 latency : {0:10.2f} ms".format(1000 * results["p50"]))
+    print("  p99 latency : {0:10.2f} ms".format(1000 * results["p99"]))
+    return
+
+if __name__ == "__main__":
+    bench_startup()
+    bench_wrong_answers()
+    bench_hard_mode()
+    bench_headless()
+    bench_score_art()
+    bench_server()
@@ -0,0 +1,168 @@
+# Serve the python builtins quiz to many users at once over TCP
+
+import argparse
+import asyncio
+import functools
+import random
+import statistics
+import time
+
+from quizmaster import Quiz
+
+# The line protocol. For each question the server sends
+#
+#   Q <question number> <keyword>
+#   a) <definition>
+#   b) <definition>
+#   c) <definition>
+#   d) <definition>
+#   ?
+#
+# and the client answers with a single line holding its letter. The server
+# replies 'CORRECT' or 'WRONG <correct letter>', and after the last question
+# sends 'SCORE <correct>/<total>' and hangs up.
+
+def load_bank(file_name):
+    """
+    Read a quiz bank from a text file with one 'keyword : definition' per line,
+    like Juan's builtins.txt.
+
+    :param file_name: str, the path to the quiz bank
+    :return: keywords, definitions: lists of str
+    """
+    keywords, definitions = [], []
+    with open(file_name, 'r') as f:
+        for line in f:
+            keyword, sep, definition = line.rstrip('\n').partition(" : ")
+            if sep:
+                keywords.append(keyword)
+                definitions.append(definition)
+
+    return keywords, definitions
+
+async def run_session(quiz, num_questions, reader, writer):
+    """
+    Quiz one connected user. All sessions share the same Quiz, which is only
+    read from, so no locking is needed.
+
+    :param quiz: Quiz, the shared quiz bank
+    :param num_questions: int, number of questions in the session
+    :param reader: asyncio.StreamReader, the user's input
+    :param writer: asyncio.StreamWriter, the user's output
+    """
+    num_correct = 0
+    try:
+        keywords = random.sample(quiz.keywords, num_questions)
+        for question_num, keyword in enumerate(keywords, start=1):
+            question = quiz.make_question(keyword)
+            lines = ["Q {0} {1}".format(question_num, keyword)]
+            for letter, definition in question["choices"].items():
+                lines.append("{0}) {1}".format(letter, str(definition).replace('\n', ' ')))
+            lines.append("?")
+            writer.write(('\n'.join(lines) + '\n').encode())
+            await writer.drain()
+
+            response = await reader.readline()
+            if not response:
+                # The user hung up
+                return
+
+            if response.decode().strip().lower() == question["answer"]:
+                num_correct += 1
+                writer.write(b"CORRECT\n")
+            else:
+                writer.write("WRONG {}\n".format(question["answer"]).encode())
+
+        writer.write("SCORE {0}/{1}\n".format(num_correct, num_questions).encode())
+        await writer.drain()
+
+    except ConnectionError:
+        pass
+
+    finally:
+        writer.close()
+
+    return
+
+async def serve(quiz, host='127.0.0.1', port=8642, num_questions=10):
+    """
+    Run the quiz server until it is cancelled.
+
+    :param quiz: Quiz, the shared quiz bank
+    :param host: str, the address to listen on
+    :param port: int, the port to listen on
+    :param num_questions: int, number of questions in each session
+    """
+    handler = functools.partial(run_session, quiz, num_questions)
+    server = await asyncio.start_server(handler, host, port, backlog=4096)
+    async with server:
+        await server.serve_forever()
+
+async def simulate_user(host, port, latencies):
+    """
+    Connect to the server and answer every question with a random guess,
+    recording how long each question took to arrive after answering the
+    previous one (or after connecting, for the first question).
+
+    :param host: str, the server address
+    :param port: int, the server port
+    :param latencies: list, question latencies in seconds are appended here
+    """
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line or line.startswith(b"SCORE"):
+                break
+            if line == b"?\n":
+                latencies.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                writer.write(random.choice("abcd").encode() + b"\n")
+                await writer.drain()
+    finally:
+        writer.close()
+
+    return
+
+async def load_test(host='127.0.0.1', port=8642, num_sessions=1000):
+    """
+    Run many simulated users at once against a quiz server.
+
+    :param host: str, the server address
+    :param port: int, the server port
+    :param num_sessions: int, the number of concurrent users
+    :return: results: dict, the number of 'questions' answered, the 'elapsed'
+             seconds and the 'p50' and 'p99' question latencies in seconds
+    """
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(simulate_user(host, port, latencies) for _ in range(num_sessions)))
+    elapsed = time.perf_counter() - start
+
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {"questions": len(latencies), "elapsed": elapsed,
+            "p50": percentiles[49], "p99": percentiles[98]}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host the python builtins quiz for many users")
+    parser.add_argument("command", choices=["serve", "load"],
+                        help="run the server, or a load test against a running server")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8642)
+    parser.add_argument("--questions", type=int, default=10, help="questions per session")
+    parser.add_argument("--sessions", type=int, default=1000, help="concurrent users for the load test")
+    parser.add_argument("--bank", default=None, help="'keyword : definition' file to quiz on instead of the builtins")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        keywords, definitions = load_bank(args.bank) if args.bank else (None, None)
+        quiz = Quiz(keywords, definitions, auto_start=False)
+        print("Serving the quiz on {0}:{1}".format(args.host, args.port))
+        asyncio.run(serve(quiz, args.host, args.port, args.questions))
+
+    else:
+        results = asyncio.run(load_test(args.host, args.port, args.sessions))
+        print("{0} questions in {1:.2f} s".format(results["questions"], results["elapsed"]))
+        print("  p50 latency : {0:8.2f} ms".format(1000 * results["p50"]))
+        print("  p99 latency : {0:8.2f} ms".format(1000 * results["p99"]))
@@ -1,29 +1,90 @@
 # An interactive quiz of python builtins
 
-import pyfiglet
+import builtins
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import json
+import math
+import os
 import random
+import re
+import sys
 import textwrap
 import time
+import zlib
+
+# Builtin docstrings and rendered art are cached here between runs
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".quizmaster_cache")
+
+# Letters used to label answer choices
+LETTERS = ['a', 'b', 'c', 'd']
+
+@functools.lru_cache(maxsize=8)
+def _get_figlet(font):
+    """
+    Make one Figlet per font, since loading a font is slow.
+
+    :param font: str, the pyfiglet font
+    :return: fig: the pyfiglet Figlet for the font
+    """
+    import pyfiglet
+    return pyfiglet.Figlet(font=font)
+
+@functools.lru_cache(maxsize=512)
+def render_glyph(font, char):
+    """
+    Render a single character in ascii art. Results are cached, so each
+    character is only rendered once per font.
+
+    :param font: str, the pyfiglet font
+    :param char: str, the character to render
+    :return: lines: tuple, the rows of the glyph, all padded to the same width
+    """
+    lines = _get_figlet(font).renderText(char).split('\n')
+    width = max(len(line) for line in lines)
+    return tuple(line.ljust(width) for line in lines)
+
+def render_text(text, font='standard'):
+    """
+    Render text in ascii art by placing cached glyphs side by side. Unlike
+    Figlet.renderText the letters are not squeezed together, but nothing has
+    to be rendered again for text made of characters seen before.
+
+    :param text: str, the text to render
+    :param font: str, the pyfiglet font
+    :return: lines: list, the rows of the rendered text
+    """
+    glyphs = [render_glyph(font, char) for char in text]
+    height = max((len(glyph) for glyph in glyphs), default=0)
+    rows = []
+    for row in range(height):
+        rows.append(''.join(glyph[row] if row < len(glyph) else ' ' * len(glyph[0])
+                            for glyph in glyphs))
+    return rows
 
 class Quiz():
     """
     An interactive quiz of python builtins
     """
-    def __init__(self, keywords=None, definitions=None):
+    def __init__(self, keywords=None, definitions=None, hard=False, font='standard', auto_start=True):
         """
         Make a mapping of keywords to definitions and start quiz.
 
         :param keywords: array-like, keywords for quiz
         :param definitions: array-like, definitions for quiz
+        :param hard: bool, if True the wrong answers are the definitions most
+                     similar to the correct one instead of random ones
+        :param font: str, the pyfiglet font for ascii displays
+        :param auto_start: bool, if True start the quiz right away
         """
-        # Use pyfiglet for ascii displays
-        self.fig = pyfiglet.Figlet(font='standard')
+        # Use pyfiglet for ascii displays, but only load it when needed
+        self.font = font
+        self._cache = None
         self._store_art()
         
         if keywords is None:
             # No keywords specified, so use all
-            self.quiz_info = {x: eval(x).__doc__ for x in dir(__builtins__)}
-            self._insert_missing_docs()
+            self.quiz_info = dict(self._load_cache()["builtins"])
 
         if keywords is not None and definitions is not None:
             # Make a dictionary from specified keywords
@@ -38,14 +99,82 @@ class Quiz():
         if not hasattr(self, "quiz_info"):
             print("You must supply definitions if you supply keywords.")
             exit()
-            
-        self.start()
+
+        self._index_definitions()
+        if hard:
+            self._index_neighbors()
+        if auto_start:
+            self.start()
         return
 
-    def _insert_missing_docs(self):
+    @property
+    def fig(self):
+        """
+        The pyfiglet Figlet, created the first time it is used since importing
+        pyfiglet and loading a font is slow.
+        """
+        return _get_figlet(self.font)
+
+    @property
+    def correct(self):
+        return self._load_cache()["art"]["correct"]
+
+    def _cache_file(self):
+        """
+        The cache depends on the python version (for the builtins) and the font
+        (for the art), so both go in the file name.
+
+        :return: path: str, the path to the cache file
+        """
+        version = "{}.{}.{}".format(*sys.version_info[:3])
+        return os.path.join(CACHE_DIR, "py{0}-{1}.json".format(version, self.font))
+
+    def _load_cache(self):
+        """
+        Read the builtin docstrings and rendered art from the cache file the
+        first time they are needed, building the cache if it doesn't exist yet.
+
+        :return: cache: dict, with 'builtins' and 'art' entries
+        """
+        if self._cache is not None:
+            return self._cache
+
+        try:
+            with open(self._cache_file(), 'r') as f:
+                self._cache = json.load(f)
+            return self._cache
+        except (OSError, ValueError):
+            pass
+
+        # Build the cache and try to save it for next time
+        self._cache = self._build_cache()
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(self._cache_file(), 'w') as f:
+                json.dump(self._cache, f)
+        except OSError:
+            pass
+
+        return self._cache
+
+    def _build_cache(self):
+        """
+        Collect the builtin docstrings and render the ascii art.
+
+        :return: cache: dict, with 'builtins' and 'art' entries
+        """
+        quiz_info = {x: getattr(builtins, x).__doc__ for x in dir(builtins)}
+        self._insert_missing_docs(quiz_info)
+        art = {"correct": self.fig.renderText("CORRECT!")}
+
+        return {"builtins": quiz_info, "art": art}
+
+    def _insert_missing_docs(self, quiz_info):
         """
         Some of the python builtins have 'None' for their __doc__. Fill in
         the mssing values here.
+
+        :param quiz_info: dict, the mapping of builtins to definitions to fill in
         """
         missing = ["Ellipsis", "None", "NotImplemented", "__doc__",
                    "__name__", "__package__", "__spec__", "exit", "quit"]
@@ -62,47 +191,179 @@ class Quiz():
                 "Prompt the user to quit the script"]
 
         for m, d in zip(missing, defs):
-            self.quiz_info[m] = d
+            quiz_info[m] = d
 
         return
 
-    def pose_question(self, keyword):
+    def _index_definitions(self):
         """
-        Ask user to select definition of specified keyword.
-        
-        :param keyword: str, name of python keyword for question
-        :return: correct: bool, True if correct, False if wrong 
+        Store the keywords, and each distinct definition once along with its
+        position, so questions and wrong answers can be sampled without
+        rebuilding a list of the whole quiz bank for every question.
         """
+        self.keywords = list(self.quiz_info.keys())
+        self.definitions = list(dict.fromkeys(self.quiz_info.values()))
+        self.definition_index = {d: idx for idx, d in enumerate(self.definitions)}
+        self.neighbors = None
+
+        return
 
+    def _index_neighbors(self, num_neighbors=3, num_features=1024, block_size=1024):
+        """
+        Precompute the most similar other definitions for every definition so
+        hard questions can use them as wrong answers. Definitions become hashed
+        bag-of-words TF-IDF vectors and are compared by cosine similarity. This
+        compares every pair of definitions once at startup, which is quick for
+        the builtins and fine up to tens of thousands of definitions.
+
+        :param num_neighbors: int, the number of neighbors to keep per definition
+        :param num_features: int, the number of hash buckets for words
+        :param block_size: int, the number of definitions compared at a time
+        """
+        # Only hard mode needs numpy
+        import numpy as np
+
+        # Count the words in each definition, hashed into a fixed number of columns
+        num_definitions = len(self.definitions)
+        counts = np.zeros((num_definitions, num_features), dtype=np.float32)
+        for row, definition in enumerate(self.definitions):
+            for word in re.findall(r"[a-z]+", str(definition).lower()):
+                counts[row, zlib.crc32(word.encode()) % num_features] += 1
+
+        # Weight rare words more heavily and normalize each definition
+        doc_freq = (counts > 0).sum(axis=0)
+        idf = np.log((1 + num_definitions) / (1 + doc_freq)) + 1
+        vectors = counts * idf.astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        vectors /= norms
+
+        # Keep the closest definitions to each one, never itself
+        num_neighbors = min(num_neighbors, num_definitions - 1)
+        if num_neighbors < 1:
+            return
+        neighbors = np.empty((num_definitions, num_neighbors), dtype=np.int64)
+        for start in range(0, num_definitions, block_size):
+            similarity = vectors[start:start + block_size] @ vectors.T
+            rows = np.arange(similarity.shape[0])
+            similarity[rows, start + rows] = -math.inf
+            closest = np.argpartition(-similarity, num_neighbors - 1, axis=1)
+            neighbors[start:start + block_size] = closest[:, :num_neighbors]
+        self.neighbors = neighbors.tolist()
+
+        return
+
+    def _choose_wrong_answers(self, correct_answer, num_wrong):
+        """
+        Randomly choose distinct definitions that are not the correct answer.
+        Random positions are drawn and rejected if they repeat or hit the correct
+        answer, so this is O(num_wrong) for a quiz bank of any size. In hard
+        mode the precomputed neighbors of the correct answer are used instead.
+
+        :param correct_answer: str, the definition to leave out
+        :param num_wrong: int, the number of wrong answers to choose
+        :return: wrong_answers: list, the chosen definitions
+        """
+        num_definitions = len(self.definitions)
+        correct_idx = self.definition_index[correct_answer]
+        num_distinct = min(num_wrong, num_definitions - 1)
+
+        # Hard mode uses the precomputed most similar definitions
+        if self.neighbors is not None:
+            wrong_answers = [self.definitions[idx] for idx in self.neighbors[correct_idx][:num_wrong]]
+            num_distinct = len(wrong_answers)
+
+        else:
+            wrong_answers = []
+
+        chosen = {correct_idx}
+        while len(wrong_answers) < num_distinct:
+            idx = random.randrange(num_definitions)
+            if idx not in chosen:
+                chosen.add(idx)
+                wrong_answers.append(self.definitions[idx])
+
+        # Tiny quiz banks don't have enough definitions to avoid repeats
+        while 0 < len(wrong_answers) < num_wrong:
+            wrong_answers.append(random.choice(wrong_answers[:num_distinct]))
+
+        return wrong_answers
+
+    def make_question(self, keyword):
+        """
+        Build a multiple choice question for a keyword without displaying it.
+
+        :param keyword: str, name of python keyword for question
+        :return: question: dict, the 'keyword', the 'choices' mapping each letter
+                 to a definition, and the letter of the correct 'answer'
+        """
         # Determine correct answer
         correct_answer = self.quiz_info[keyword]
         
-        # Prevent correct answer from being used twice
-        weights = [1 if d != correct_answer else 0 for d in self.quiz_info.values()]
-        wrong_answers = random.choices(list(self.quiz_info.values()), weights=weights, k=3)
+        # Pick three different wrong answers
+        wrong_answers = self._choose_wrong_answers(correct_answer, 3)
         wrong_iter = iter(wrong_answers)
 
         # Define answer choices as letters and randomly choose the correct answer
-        shuffled_answers = ['a', 'b', 'c', 'd']
-        answers = shuffled_answers[:]
-        random.shuffle(shuffled_answers)
-        correct_choice = shuffled_answers.pop()
-        correct_idx = answers.index(correct_choice)
+        correct_choice = random.choice(LETTERS)
+        choices = {}
+        for letter in LETTERS:
+            if letter == correct_choice:
+                choices[letter] = correct_answer
+            else:
+                choices[letter] = next(wrong_iter)
 
-        print("\nSelect the correct definition of '{}'\n".format(keyword))
-        for idx, ans in enumerate(answers):
+        return {"keyword": keyword, "choices": choices, "answer": correct_choice}
 
-            if idx == correct_idx:
-                print("  " + ans + ')\t' + self._format_answer(correct_answer) + '\n')
-            else:
-                print("  " + ans + ')\t' + self._format_answer(next(wrong_iter)) + '\n')
+    def pose_question(self, keyword):
+        """
+        Ask user to select definition of specified keyword.
+        
+        :param keyword: str, name of python keyword for question
+        :return: correct: bool, True if correct, False if wrong 
+        """
+        question = self.make_question(keyword)
+
+        print("\nSelect the correct definition of '{}'\n".format(keyword))
+        for letter, definition in question["choices"].items():
+            print("  " + letter + ')\t' + self._format_answer(definition) + '\n')
         
         user_choice = input("Enter your selection: ").strip().lower()
-        while user_choice not in answers:
+        while user_choice not in LETTERS:
             print("You must select from ['a', 'b', 'c', 'd']...")
             user_choice = input("Enter your selection: ").strip().lower()
 
-        return user_choice == correct_choice
+        return user_choice == question["answer"]
+
+    def run(self, answers, num_questions=10):
+        """
+        Run the quiz without printing, sleeping or reading input. Useful for
+        testing the grading logic and for simulating lots of sessions.
+
+        :param answers: iterable of letters to answer the questions with, or a
+                        function that is called with each question dict and
+                        returns a letter
+        :param num_questions: int, number of questions in quiz
+        :return: results: dict, the asked 'questions' (question dicts with the
+                 'response' given and whether it was 'correct'), 'num_correct'
+                 and 'num_questions'
+        """
+        if callable(answers):
+            respond = answers
+        else:
+            answer_iter = iter(answers)
+            respond = lambda question: next(answer_iter)
+
+        questions = []
+        num_correct = 0
+        for keyword in random.sample(self.keywords, num_questions):
+            question = self.make_question(keyword)
+            question["response"] = str(respond(question)).strip().lower()
+            question["correct"] = question["response"] == question["answer"]
+            num_correct += question["correct"]
+            questions.append(question)
+
+        return {"questions": questions, "num_correct": num_correct, "num_questions": num_questions}
 
 
         
@@ -121,16 +382,15 @@ class Quiz():
 
     def _format_score(self, correct, total):
         """
-        Print the score in ascii art
+        Print the score in ascii art, built from cached glyphs
 
         :param correct: int, the number of questions answered correctly
         :param total: int, the number of questions asked
         :return: score: ascii representation of the user's score
         """
-        correct_ascii = self.fig.renderText(str(correct)).split('\n')
-        total_ascii = self.fig.renderText(str(total)).split('\n')
-        prefix = self.fig.renderText("Score: ").replace('\n', '   \n').split('\n')
-        score = [w + x + y + z for w, x, y, z in zip(prefix, correct_ascii, self.slash.split('\n'), total_ascii)]
+        prefix = render_text("Score: ", self.font)
+        fraction = render_text("{0}/{1}".format(correct, total), self.font)
+        score = [x + '   ' + y for x, y in zip(prefix, fraction)]
 
         return score
 
@@ -151,9 +411,9 @@ class Quiz():
         
     def _store_art(self):
         """
-        Store ascii messages as object attributes.
+        Store ascii messages as object attributes. The pyfiglet art is
+        rendered lazily by the correct property.
         """
-        self.correct = self.fig.renderText("CORRECT!")
         self.title = """
          ____        _   _                 
         |  _ \ _   _| |_| |__   ___  _ __  
@@ -175,7 +435,6 @@ class Quiz():
         |_| \_|\___/| .__/ \___|    (_) /_/   
                     |_|                    
         """
-        self.slash = self.fig.renderText("/")
 
         return
 
@@ -231,5 +490,54 @@ class Quiz():
         score = self._format_score(num_correct, num_questions)
         print('\n'.join(score))
 
+# Functions for simulating many quiz sessions at once
+_worker_quiz = None
+
+def _start_worker(keywords, definitions):
+    """
+    Build the Quiz that a worker process uses for all of its sessions.
+
+    :param keywords: array-like, keywords for quiz, or None for the builtins
+    :param definitions: array-like, definitions for quiz
+    """
+    global _worker_quiz
+    _worker_quiz = Quiz(keywords, definitions, auto_start=False)
+    return
+
+def _guess(question):
+    """
+    Answer a question by picking a letter at random.
+    """
+    return random.choice(LETTERS)
+
+def _run_session(num_questions):
+    """
+    Run one simulated session in a worker process.
+
+    :param num_questions: int, number of questions in the session
+    :return: num_correct: int, the number of questions guessed correctly
+    """
+    return _worker_quiz.run(_guess, num_questions)["num_correct"]
+
+def run_sessions(num_sessions, num_questions=10, workers=None, keywords=None, definitions=None):
+    """
+    Simulate many quiz sessions, answered by random guessing, across a pool of
+    processes. Each worker builds its Quiz once and only scores are sent back.
+
+    :param num_sessions: int, the number of sessions to run
+    :param num_questions: int, number of questions in each session
+    :param workers: int, the number of processes, defaults to the number of CPUs
+    :param keywords: array-like, keywords for quiz, or None for the builtins
+    :param definitions: array-like, definitions for quiz
+    :return: scores: list, the number correct in each session
+    """
+    workers = workers or os.cpu_count()
+    chunksize = max(1, num_sessions // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(keywords, definitions)) as pool:
+        scores = list(pool.map(_run_session, [num_questions] * num_sessions, chunksize=chunksize))
+
+    return scores
+
 if __name__ == "__main__":
     q = Quiz()
@@ -1,61 +1,214 @@
 # A module to define the banking classes
 
 from collections import defaultdict
+import contextlib
 import copy
 import datetime
-import os
+import math
 from random import randint
 import sqlite3
 import sys
+import threading
+
+# The ledger schema, as the list of statements that take the database
+# from each version to the next. Only ever add to the end of this.
+MIGRATIONS = [
+    # 1: the original tables
+    ["""CREATE TABLE IF NOT EXISTS accounts
+        (number text, pin text)""",
+     """CREATE TABLE IF NOT EXISTS transactions
+        (number text, amount real)"""],
+
+    # 2: balances kept up to date with the transactions, filled in by
+    #    replaying the ledger one last time
+    ["""CREATE TABLE IF NOT EXISTS balances
+        (number text PRIMARY KEY, balance real)""",
+     """INSERT OR IGNORE INTO balances
+        SELECT number, SUM(amount) FROM transactions
+        GROUP BY number"""],
+
+    # 3: unique account numbers, transaction ids and timestamps, and an
+    #    index to find the transactions of an account. Transactions from
+    #    before this have no timestamp.
+    ["""CREATE TABLE new_accounts
+        (number text PRIMARY KEY, pin text NOT NULL)""",
+     """INSERT OR IGNORE INTO new_accounts
+        SELECT number, pin FROM accounts""",
+     """DROP TABLE accounts""",
+     """ALTER TABLE new_accounts RENAME TO accounts""",
+     """CREATE TABLE new_transactions
+        (id integer PRIMARY KEY,
+         number text NOT NULL,
+         amount real NOT NULL,
+         timestamp text)""",
+     """INSERT INTO new_transactions (number, amount)
+        SELECT number, amount FROM transactions ORDER BY rowid""",
+     """DROP TABLE transactions""",
+     """ALTER TABLE new_transactions RENAME TO transactions""",
+     """CREATE INDEX transactions_by_account
+        ON transactions (number, timestamp)"""],
+
+    # 4: the account number allocator. next is how many numbers have
+    #    been handed out and key scrambles them, see Account._generate_number
+    ["""CREATE TABLE account_numbers
+        (id integer PRIMARY KEY CHECK (id = 0),
+         next integer NOT NULL,
+         key integer NOT NULL)""",
+     """INSERT INTO account_numbers
+        VALUES (0, 0, abs(random() % 4294967296))"""],
+]
+
+# Account numbers are 7 digits
+FIRST_ACCOUNT_NUMBER = 1000000
+NUM_ACCOUNT_NUMBERS = 9000000
 
 class Bank:
-    def __init__(self):
+    def __init__(self, db_file='bank_ledger.db', flush_interval=0.0, batch_size=1000):
         """
         Create a bank to store the accounts, pins, and a 
         ledger of transactions.
-        """
-        self.accounts = defaultdict(lambda: Account())
+
+        Transactions are written to the database in groups. With a
+        flush_interval of 0 every transaction is committed as soon as it is
+        made, so none can be lost. Otherwise transactions are held for up to
+        flush_interval seconds (or until batch_size of them pile up) and
+        committed together, which is much faster but means a crash can lose
+        the last flush_interval seconds of transactions.
+
+        :param db_file: str, the sqlite3 database holding the ledger
+        :param flush_interval: float, the most seconds a transaction waits
+                                      before it is committed
+        :param batch_size: int, the most transactions committed together
+        """
+        self.db_file = db_file
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.accounts = {}
         self.pins = {}
         self.ledger = []
+        self.ledger_lock = threading.Lock()
+        self.flush_timer = None
+        self.account_locks = {}
+        self.account_locks_lock = threading.Lock()
         self.load_ledger()
         return
 
     def load_ledger(self):
         """
         Read the sqlite3 database into the bank data structures.
-        If no database exists, make one.
+        If no database exists, make one, and bring the schema of an
+        older one up to date.
+        """
+        # Establish connection to database. The flush timer commits
+        # from its own thread, so the connection has to be shareable.
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+
+        # Write-ahead logging lets readers carry on while the ledger is
+        # written. Committing every transaction has to survive a power
+        # cut, group commits only have to survive the program crashing.
+        self.conn.execute("""PRAGMA journal_mode = WAL""")
+        if self.flush_interval > 0:
+            self.conn.execute("""PRAGMA synchronous = NORMAL""")
+        else:
+            self.conn.execute("""PRAGMA synchronous = FULL""")
+        self.conn.execute("""PRAGMA busy_timeout = 5000""")
+        self.conn.execute("""PRAGMA cache_size = -16000""")
+        self.conn.execute("""PRAGMA temp_store = MEMORY""")
+
+        self.migrate()
+        self.update_accounts()
+        return
+
+    def migrate(self):
         """
-        if not os.path.exists('bank_ledger.db'):
-            # Establish connection to database
-            self.conn = sqlite3.connect('bank_ledger.db')
-            c = self.conn.cursor()
+        Run the migrations the database hasn't had yet. The schema version
+        is kept in the database's user_version, and each migration is
+        applied in its own transaction along with the version bump, so a
+        crash part way through leaves the database at the last version.
 
-            # Create tables
-            c.execute("""CREATE TABLE accounts
-                         (number text, pin text)""")
-            c.execute("""CREATE TABLE transactions
-                         (number text, amount real)""")
-            self.conn.commit()
-            
-        else:
-            # Read in an existing database
-            self.conn = sqlite3.connect('bank_ledger.db')
-            self.update_accounts()
+        :return: version: int, the schema version of the database
+        """
+        version = self.conn.execute("""PRAGMA user_version""").fetchone()[0]
+        if version > len(MIGRATIONS):
+            raise YaSuckAtCodingError(
+                "{0} is schema version {1} but this code only knows about {2}".format(
+                    self.db_file, version, len(MIGRATIONS)))
+
+        for version, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            self.conn.execute("""BEGIN""")
+            try:
+                for statement in statements:
+                    self.conn.execute(statement)
+                self.conn.execute("""PRAGMA user_version = {}""".format(version))
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
 
-            return
+        return version
 
     def update_ledger(self):
         """
-        For a transaction in the ledger, write it to the database.
+        Write every transaction waiting in the ledger to the database
+        and commit them all at once.
         """
-        while len(self.ledger) > 0:
-            transaction = self.ledger.pop()
-            c = self.conn.cursor()
-            c.execute("""INSERT INTO transactions 
-                         VALUES ({0}, {1})""".format(transaction.account,
-                                                     transaction.amount))
-            self.conn.commit()
-            
+        with self.ledger_lock:
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+            if len(self.ledger) == 0:
+                return
+
+            rows = [(str(t.account), t.amount, t.timestamp.isoformat(' '))
+                    for t in self.ledger]
+
+            # Net change of each account in this batch
+            changes = defaultdict(float)
+            for number, amount, _ in rows:
+                changes[number] += amount
+
+            # The balances are updated in the same commit as the
+            # transactions so the two can never disagree. If the write
+            # fails nothing is kept and the transactions stay in the
+            # ledger to be written by the next flush.
+            try:
+                self.conn.executemany("""INSERT INTO transactions (number, amount, timestamp)
+                                         VALUES (?, ?, ?)""", rows)
+                self.conn.executemany("""INSERT INTO balances VALUES (?, ?)
+                                         ON CONFLICT (number) DO UPDATE
+                                         SET balance = balance + excluded.balance""",
+                                      changes.items())
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.ledger = []
+
+        return
+
+    def _queue_transaction(self, *transactions):
+        """
+        Add transactions to the ledger and write the ledger to the
+        database if the flush policy says it is time. Transactions queued
+        together are always committed together.
+
+        :param transactions: Transaction, the transactions to record
+        """
+        with self.ledger_lock:
+            self.ledger.extend(transactions)
+            flush_now = (self.flush_interval <= 0
+                         or len(self.ledger) >= self.batch_size)
+
+            # Make sure the first transaction of a batch is committed
+            # within flush_interval even if no more come in
+            if not flush_now and self.flush_timer is None:
+                self.flush_timer = threading.Timer(self.flush_interval, self.update_ledger)
+                self.flush_timer.daemon = True
+                self.flush_timer.start()
+
+        if flush_now:
+            self.update_ledger()
+
         return
 
     def update_accounts(self):
@@ -65,23 +218,84 @@ class Bank:
         """
         # Get account numbers and pins
         c = self.conn.cursor()
-        c.execute("""SELECT * FROM accounts""")
+        c.execute("""SELECT number, pin FROM accounts""")
         for num, pin in c.fetchall():
             self.pins[num] = pin
+            self.accounts[num] = Account(num)
+            self.accounts[num].pin = pin
 
-        # Get the record of all transactions and execute them
-        c.execute("""SELECT * FROM transactions""")
-        for num, amount in c.fetchall():
-            self.accounts[num].balance += amount
+        # Get the balances, which are kept up to date with every
+        # transaction so the ledger doesn't need replaying
+        c.execute("""SELECT number, balance FROM balances""")
+        for num, balance in c.fetchall():
+            self.accounts.setdefault(num, Account(num)).balance = balance
 
         return
 
+    def check_balances(self):
+        """
+        Recompute every balance from the raw transactions and compare it
+        to the balances table and to the accounts in memory.
+
+        :return: mismatches: dict, maps each account number whose balances
+                             disagree to a (ledger, table, memory) tuple
+        """
+        self.update_ledger()
+        with self.ledger_lock:
+            c = self.conn.cursor()
+            c.execute("""SELECT number, SUM(amount) FROM transactions
+                         GROUP BY number""")
+            from_ledger = dict(c.fetchall())
+            c.execute("""SELECT number, balance FROM balances""")
+            from_table = dict(c.fetchall())
+
+        mismatches = {}
+        for num in set(from_ledger) | set(from_table):
+            ledger_balance = from_ledger.get(num, 0.0)
+            table_balance = from_table.get(num, 0.0)
+            memory_balance = self.accounts[num].balance if num in self.accounts else 0.0
+            # Allow for the sums being added up in a different order
+            if not (math.isclose(ledger_balance, table_balance, abs_tol=1e-6)
+                    and math.isclose(ledger_balance, memory_balance, abs_tol=1e-6)):
+                mismatches[num] = (ledger_balance, table_balance, memory_balance)
+
+        return mismatches
+
+    def statement(self, number, since=None):
+        """
+        List the transactions of an account, oldest first. Found with the
+        account number index, so this doesn't scan the whole ledger.
+
+        :param number: str, the account number
+        :param since: datetime, only list transactions made at or after
+                                this time. Transactions from before the
+                                ledger had timestamps have none and are
+                                only listed when since is None.
+        :return: transactions: list of (id, timestamp, amount) tuples, where
+                               timestamp is a datetime or None
+        """
+        self.update_ledger()
+        with self.ledger_lock:
+            if since is None:
+                rows = self.conn.execute("""SELECT id, timestamp, amount FROM transactions
+                                            WHERE number = ?
+                                            ORDER BY id""", (str(number),)).fetchall()
+            else:
+                rows = self.conn.execute("""SELECT id, timestamp, amount FROM transactions
+                                            WHERE number = ? AND timestamp >= ?
+                                            ORDER BY id""", (str(number), since.isoformat(' '))).fetchall()
+
+        return [(transaction_id,
+                 datetime.datetime.fromisoformat(timestamp) if timestamp is not None else None,
+                 amount)
+                for transaction_id, timestamp, amount in rows]
+
     def close_bank(self):
         """
-        Close the connection to the database. All transactions are 
-        written at the time of execution, so nothing else is 
-        needed here.
+        Write any transactions still waiting in the ledger and close
+        the connection to the database.
         """
+        self.update_ledger()
         self.conn.close()
         sys.exit()
         return
@@ -91,39 +305,89 @@ class Bank:
         Create a new account. Generate a new account number and PIN. 
         Add the account to the database.
 
-        :param number: str, the account number to open
+        :param number: str, the account number to open. If no number is
+                            supplied a new unique number is generated
         :return: account: An Account instance for the object just created
         """
-        # Make a new account
-        account = Account(number)
-        account_pin = account._generate_pin()
-        account.pin = account_pin
+        account_pin = Account._generate_pin()
 
-        # Store the account in the Bank data structures
+        # Add the account to the database. BEGIN IMMEDIATE takes the write
+        # lock up front, so banks in other processes wait their turn rather
+        # than handing out the same number.
+        with self.ledger_lock:
+            self.conn.execute("""BEGIN IMMEDIATE""")
+            try:
+                if number is None:
+                    number = self._allocate_number()
+                self.conn.execute("""INSERT INTO accounts
+                                     VALUES (?, ?)""", (str(number), account_pin))
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+
+        # Make a new account and store it in the Bank data structures
+        account = Account(str(number))
+        account.pin = account_pin
         self.accounts[account.number] = account
         self.pins[account.number] = account_pin
-
-        # Add the account to the database
-        self.conn.execute("""INSERT INTO accounts
-                             VALUES ({0}, {1})""".format(account.number, account_pin))
-        self.conn.commit()
         
         return account
 
+    def _allocate_number(self):
+        """
+        Take the next unused account number from the database. Must be
+        called inside a write transaction.
+
+        :return: num: str, a unique account number
+        """
+        c = self.conn.cursor()
+        c.execute("""SELECT next, key FROM account_numbers""")
+        counter, key = c.fetchone()
+
+        # Skip numbers that were picked by hand when opening an account
+        while True:
+            if counter >= NUM_ACCOUNT_NUMBERS:
+                raise YaTooPopularException
+            num = Account._generate_number(counter, key)
+            counter += 1
+            c.execute("""SELECT 1 FROM accounts WHERE number = ?""", (num,))
+            if c.fetchone() is None:
+                break
+
+        c.execute("""UPDATE account_numbers SET next = ?""", (counter,))
+        return num
+
     def close_account(self, account):
         """
-        Withdraw the entire balance and remove the account.
+        Withdraw the entire balance and remove the account, from the
+        database as well, so the number can be opened again. Its
+        transactions stay in the ledger.
 
         :param account: An Account instance
         """
-        # Don't let someone close an account with a debt
-        if account.balance < 0.0:
-            raise YaBrokeException
-
-        # Withdraw all money and delete the account 
-        self.make_withdrawal(account, account.balance)
-        del self.accounts[account.number]
-        del self.pins[account.number]
+        with self.lock_accounts(account):
+            # Don't let someone close an account with a debt
+            if account.balance < 0.0:
+                raise YaBrokeException
+
+            # Withdraw all money and delete the account. The withdrawal is
+            # written first so it doesn't bring the balances row back.
+            self.make_withdrawal(account, account.balance)
+            self.update_ledger()
+            with self.ledger_lock:
+                self.conn.execute("""BEGIN IMMEDIATE""")
+                try:
+                    self.conn.execute("""DELETE FROM accounts
+                                         WHERE number = ?""", (str(account.number),))
+                    self.conn.execute("""DELETE FROM balances
+                                         WHERE number = ?""", (str(account.number),))
+                    self.conn.commit()
+                except BaseException:
+                    self.conn.rollback()
+                    raise
+            del self.accounts[account.number]
+            del self.pins[account.number]
         
         return
 
@@ -146,7 +410,8 @@ class Bank:
         :param account: Account, the account to deposit into
         :param amount: float, the (positive) amount to deposit
         """
-        self._make_transaction(account, amount)
+        with self.lock_accounts(account):
+            self._queue_transaction(self._make_transaction(account, amount))
         return
 
     def make_withdrawal(self, account, amount):
@@ -156,55 +421,99 @@ class Bank:
         :param account: Account, the account to withdraw from 
         :param amount: float, the (positive) amount to withdrawal
         """
-        # Don't let people withdrawal more than they have
-        if amount > account.balance:
-            raise YaBrokeException
+        with self.lock_accounts(account):
+            # Don't let people withdrawal more than they have
+            if amount > account.balance:
+                raise YaBrokeException
 
-        # Make a negative transaction
-        self._make_transaction(account, -1.0 * amount, how='subtract')
+            # Make a negative transaction
+            self._queue_transaction(self._make_transaction(account, -1.0 * amount, how='subtract'))
         return
 
     def make_wire(self, from_account, to_account, amount):
         """
-        Move money from one account to another.
+        Move money from one account to another. The withdrawal and the
+        deposit are written to the database in the same commit, so the
+        money can't vanish halfway.
         
         :param from_account: Account, the account to withdraw from
         :param to_account: Account, the account to deposit into 
         :param amount: float, the (positive) amount to transfer
         """
-        self.make_withdrawal(from_account, amount)
-        self.make_deposit(to_account, amount)
+        with self.lock_accounts(from_account, to_account):
+            # Look up both accounts first, so one closed while we waited for
+            # the locks fails the wire before either balance changes
+            sender = self.accounts[from_account.number]
+            receiver = self.accounts[to_account.number]
+
+            # Don't let people wire more than they have
+            if amount > sender.balance:
+                raise YaBrokeException
+
+            # Check both amounts before touching either balance
+            withdrawal = Transaction(from_account, how='subtract')
+            withdrawal.amount = -1.0 * amount
+            deposit = Transaction(to_account)
+            deposit.amount = amount
+
+            sender.balance += withdrawal.amount
+            receiver.balance += deposit.amount
+            self._queue_transaction(withdrawal, deposit)
         return
 
     def _make_transaction(self, account, amount, how='add'):
         """
-        Document the transaction, adjust the account balance, and 
-        update the ledger database.
+        Document the transaction and adjust the account balance. The
+        caller must hold the account's lock and queue the transaction to
+        be written to the ledger database.
 
         :param account: Account, the account to make the transaction with
         :param amount: float, the amount of the transaction
         :param how: str, (add or subtract) the type of transaction
+        :return: t: Transaction, the transaction made
         """
         t = Transaction(account, how=how)
         t.amount = amount
-        self.ledger.append(t)
         self.accounts[account.number].balance += amount
-        self.update_ledger()
+        return t
+
+    @contextlib.contextmanager
+    def lock_accounts(self, *accounts):
+        """
+        Hold the locks of some accounts so no other thread can change their
+        balances. Locks are always taken in account number order, so two
+        threads wiring money between the same accounts in opposite
+        directions can't each end up holding the lock the other needs.
+        The locks are reentrant, so a thread can lock an account it
+        already holds.
+
+        :param accounts: Account, the accounts to lock
+        """
+        with self.account_locks_lock:
+            locks = [self.account_locks.setdefault(number, threading.RLock())
+                     for number in sorted({str(account.number) for account in accounts})]
+
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
         return
 
 class Account:
-    def __init__(self, number=None, balance=0.0):
+    def __init__(self, number, balance=0.0):
         """
         Create an Account to with an account number, a PIN,
         and a balance.
         
-        :param number: str, the account number. If no number is supplied
-                            a new unique number is generated
+        :param number: str, the account number, as handed out by
+                            Bank.open_account
         :param balance: float, the starting balance of the account. If no
                                balance is supplied then it is set to 0.0
         """
-        if number is None:
-            number = self._generate_number()
         self.number = number
         self.balance = balance
         self.pin = '' # overwritten by Teller during account creation
@@ -218,32 +527,31 @@ class Account:
         return str(self.number)
 
     @staticmethod
-    def _generate_number():
+    def _generate_number(counter, key):
         """
-        Generate a unique number for the account. Track all existing
-        account numbers in a text file. This is totally secure.
+        Turn the counter'th account opened into a unique, random-looking
+        account number. The counter is shuffled with a Feistel network,
+        which maps every 24 bit number to a different 24 bit number, and
+        reshuffled until it lands in range, so different counters always
+        give different account numbers without keeping track of the ones
+        already used.
 
+        :param counter: int, how many account numbers came before this one
+        :param key: int, a 32 bit key picking which shuffle to use
         :return: num: str, a unique account number
         """
-        # Check for existing accounts
-        try:
-            f = open('existing_accounts.txt', 'r')
-            existing_accounts = f.readlines()
-            f.close()
-        except FileNotFoundError:
-            existing_accounts = []
-
-        # Generate an unused account number
-        num = str(randint(1000000, 9999999))
-        while num in existing_accounts:
-            num = str(randint(1000000, 9999999))
-
-        # Document the use of the new account number
-        f = open('existing_accounts.txt', 'w+')
-        f.writelines(existing_accounts + [num])
-        f.close()
-        
-        return num
+        value = counter
+        while True:
+            left, right = value >> 12, value & 0xfff
+            for i in range(4):
+                subkey = (key >> (8 * i)) & 0xff
+                mixed = ((right ^ subkey) * 0x9e3779b1 + i) & 0xffffffff
+                left, right = right, left ^ ((mixed ^ (mixed >> 13)) & 0xfff)
+            value = (left << 12) | right
+            if value < NUM_ACCOUNT_NUMBERS:
+                break
+
+        return str(FIRST_ACCOUNT_NUMBER + value)
 
     @staticmethod
     def _generate_pin():
@@ -265,6 +573,7 @@ class Transaction:
         self.__account = account
         self.__amount = 0.0
         self.how = how
+        self.timestamp = datetime.datetime.now()
         return
 
     @property
@@ -301,6 +610,7 @@ class Transaction:
 class YaBrokeException(Exception): pass
 class YaHackinException(Exception): pass
 class YaSuckAtCodingError(Exception): pass
+class YaTooPopularException(Exception): pass
 
 # Functions for user interaction
 def menu():
@@ -407,6 +717,18 @@ def quit_session(bank):
 
 # Main body
 if __name__ == "__main__":
+    # Check the books instead of opening for business
+    if "--check" in sys.argv[1:]:
+        mismatches = Bank().check_balances()
+        for num, (ledger_balance, table_balance, memory_balance) in sorted(mismatches.items()):
+            print("Account {0}: ledger ${1:.2f}, balances table ${2:.2f}, loaded ${3:.2f}".format(
+                num, ledger_balance, table_balance, memory_balance))
+        if mismatches:
+            print("{} accounts don't add up. Somebody's getting fired.".format(len(mismatches)))
+            sys.exit(1)
+        print("All balances match the ledger.")
+        sys.exit()
+
     # Welcome the user to the bank
     welcome()
     
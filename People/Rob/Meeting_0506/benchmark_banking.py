@@ -0,0 +1,216 @@
+# Benchmarks for the bank ledger
+
+from concurrent.futures import ThreadPoolExecutor
+import math
+import os
+import random
+import tempfile
+import time
+
+from banking import Bank, YaBrokeException
+
+def bench_flush_policies(num_transactions=20000, num_accounts=100,
+                         policies=(0.0, 0.001, 0.01, 0.1)):
+    """
+    Report transactions/second for deposits made under different flush
+    policies, each on a fresh ledger database.
+
+    :param num_transactions: int, the number of deposits to make
+    :param num_accounts: int, the number of accounts to spread them over
+    :param policies: tuple, the flush intervals in seconds to try. 0 commits
+                            every transaction.
+    """
+    print("Ledger writes, {} deposits".format(num_transactions))
+    for flush_interval in policies:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bank = Bank(os.path.join(tmp_dir, 'bank_ledger.db'), flush_interval=flush_interval)
+            accounts = [bank.open_account(number=str(1000000 + i)) for i in range(num_accounts)]
+
+            start = time.perf_counter()
+            for _ in range(num_transactions):
+                bank.make_deposit(random.choice(accounts), 1.0)
+            bank.update_ledger()
+            elapsed = time.perf_counter() - start
+            bank.conn.close()
+
+        if flush_interval > 0:
+            policy = "every {0:g} ms".format(1000 * flush_interval)
+        else:
+            policy = "every transaction"
+        print("  commit {0:18}: {1:10.0f} transactions/s".format(policy, num_transactions / elapsed))
+    return
+
+def bench_startup(num_transactions=1000000, num_accounts=1000):
+    """
+    Compare opening a bank by loading the balances table against
+    replaying every transaction in the ledger.
+
+    :param num_transactions: int, the number of transactions in the ledger
+    :param num_accounts: int, the number of accounts they are spread over
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, 'bank_ledger.db')
+        bank = Bank(db_file, flush_interval=1.0, batch_size=100000)
+        accounts = [bank.open_account(number=str(1000000 + i)) for i in range(num_accounts)]
+        for _ in range(num_transactions):
+            bank.make_deposit(random.choice(accounts), 1.0)
+        bank.update_ledger()
+
+        start = time.perf_counter()
+        balances = {}
+        for num, amount in bank.conn.execute("""SELECT number, amount FROM transactions"""):
+            balances[num] = balances.get(num, 0.0) + amount
+        replay_time = time.perf_counter() - start
+        bank.conn.close()
+
+        start = time.perf_counter()
+        bank = Bank(db_file)
+        load_time = time.perf_counter() - start
+        bank.conn.close()
+
+    print("Opening a bank with {0} transactions over {1} accounts".format(num_transactions, num_accounts))
+    print("  replay transactions : {0:10.2f} ms".format(1000 * replay_time))
+    print("  load balances       : {0:10.2f} ms".format(1000 * load_time))
+    return
+
+def bench_statement(num_transactions=1000000, num_accounts=1000, num_statements=200):
+    """
+    Compare fetching account statements with the account number index
+    against scanning the whole transactions table.
+
+    :param num_transactions: int, the number of transactions in the ledger
+    :param num_accounts: int, the number of accounts they are spread over
+    :param num_statements: int, the number of statements to fetch
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bank = Bank(os.path.join(tmp_dir, 'bank_ledger.db'), flush_interval=1.0, batch_size=100000)
+        accounts = [bank.open_account(number=str(1000000 + i)) for i in range(num_accounts)]
+        for _ in range(num_transactions):
+            bank.make_deposit(random.choice(accounts), 1.0)
+        bank.update_ledger()
+        numbers = [random.choice(accounts).number for _ in range(num_statements)]
+
+        start = time.perf_counter()
+        for number in numbers:
+            bank.conn.execute("""SELECT id, timestamp, amount FROM transactions NOT INDEXED
+                                 WHERE number = ? ORDER BY id""", (number,)).fetchall()
+        scan_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for number in numbers:
+            bank.statement(number)
+        index_time = time.perf_counter() - start
+        bank.conn.close()
+
+    print("Statements from {0} transactions over {1} accounts".format(num_transactions, num_accounts))
+    print("  table scan : {0:10.2f} ms/statement".format(1000 * scan_time / num_statements))
+    print("  index      : {0:10.2f} ms/statement".format(1000 * index_time / num_statements))
+    return
+
+def file_generate_number(file_name):
+    """
+    Roughly how Account._generate_number worked before numbers came from the
+    database, for comparison: read every number handed out so far from a
+    text file, pick an unused one and write them all back.
+
+    :param file_name: str, the text file of used account numbers
+    :return: num: str, a new account number
+    """
+    try:
+        with open(file_name, 'r') as f:
+            existing_accounts = set(f.read().split())
+    except FileNotFoundError:
+        existing_accounts = set()
+
+    num = str(random.randint(1000000, 9999999))
+    while num in existing_accounts:
+        num = str(random.randint(1000000, 9999999))
+
+    with open(file_name, 'w') as f:
+        f.write('\n'.join(existing_accounts | {num}))
+    return num
+
+def bench_open_accounts(num_accounts=1000000, num_file_accounts=10000):
+    """
+    Report accounts/second for opening accounts with numbers from the
+    database allocator, against the old text file of used numbers.
+
+    :param num_accounts: int, the number of accounts to open
+    :param num_file_accounts: int, the number of numbers to draw the old way
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = os.path.join(tmp_dir, 'existing_accounts.txt')
+        start = time.perf_counter()
+        for _ in range(num_file_accounts):
+            file_generate_number(file_name)
+        file_time = time.perf_counter() - start
+
+        bank = Bank(os.path.join(tmp_dir, 'bank_ledger.db'), flush_interval=0.01)
+        start = time.perf_counter()
+        for _ in range(num_accounts):
+            bank.open_account()
+        db_time = time.perf_counter() - start
+        assert len(bank.accounts) == num_accounts
+        bank.conn.close()
+
+    print("Opening accounts")
+    print("  text file, {0:7} accounts : {1:10.0f} accounts/s".format(num_file_accounts, num_file_accounts / file_time))
+    print("  database,  {0:7} accounts : {1:10.0f} accounts/s".format(num_accounts, num_accounts / db_time))
+    return
+
+def bench_concurrent_wires(num_wires=20000, num_accounts=50, workers=16,
+                           policies=(0.0, 0.01)):
+    """
+    Stress test wires between a few accounts from many threads at once.
+    Checks that no money is made or lost, in memory or in the database,
+    and reports wires/second for each flush policy.
+
+    :param num_wires: int, the number of wires to attempt
+    :param num_accounts: int, the number of accounts to wire between
+    :param workers: int, the number of teller threads
+    :param policies: tuple, the flush intervals in seconds to try
+    """
+    print("Concurrent wires, {0} wires between {1} accounts from {2} threads".format(
+        num_wires, num_accounts, workers))
+    for flush_interval in policies:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bank = Bank(os.path.join(tmp_dir, 'bank_ledger.db'), flush_interval=flush_interval)
+            accounts = [bank.open_account() for _ in range(num_accounts)]
+            for account in accounts:
+                bank.make_deposit(account, 100.0)
+            total = sum(account.balance for account in accounts)
+
+            def wire(_):
+                from_account, to_account = random.sample(accounts, 2)
+                try:
+                    bank.make_wire(from_account, to_account, float(random.randint(1, 50)))
+                    return True
+                except YaBrokeException:
+                    return False
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(workers) as pool:
+                num_done = sum(pool.map(wire, range(num_wires)))
+            bank.update_ledger()
+            elapsed = time.perf_counter() - start
+
+            # Money only ever moves between accounts, so the total can't change
+            assert math.isclose(sum(account.balance for account in accounts), total)
+            assert all(account.balance >= 0.0 for account in accounts)
+            assert bank.check_balances() == {}
+            bank.conn.close()
+
+        if flush_interval > 0:
+            policy = "every {0:g} ms".format(1000 * flush_interval)
+        else:
+            policy = "every wire"
+        print("  commit {0:12}: {1:10.0f} wires/s ({2} of {3} went through)".format(
+            policy, num_wires / elapsed, num_done, num_wires))
+    return
+
+if __name__ == "__main__":
+    bench_flush_policies()
+    bench_startup()
+    bench_statement()
+    bench_open_accounts()
+    bench_concurrent_wires()
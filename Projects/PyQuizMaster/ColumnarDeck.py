@@ -0,0 +1,317 @@
+"""
+Column-oriented Deck that stores QuizItem attributes in compact arrays
+"""
+
+from array import array
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Union
+
+from QuizItem import QuizItem
+from Deck import Deck, read_columns
+from DeckSnapshot import (
+	from_timestamp, from_timestamps, loads, read_snapshot, to_timestamp, write_snapshot
+)
+from SearchIndex import tokenize
+
+import pandas as pd
+import os
+
+
+class StringTable:
+	"""
+	Stores every distinct string once and hands out integer ids for them.
+	Decks with lots of repeated answers only pay for each answer once.
+	"""
+
+	def __init__(self):
+		self.values: List[str] = []
+		self.ids: Dict[str, int] = {}
+
+	def __len__(self) -> int:
+		return len(self.values)
+
+	def __getitem__(self, idx: int) -> str:
+		return self.values[idx]
+
+	def intern(self, value: str) -> int:
+		"""
+		Get the id of value, adding it to the table if it is new
+		Args:
+			value : string to store
+
+		Returns:
+			integer id of the string in this table
+		"""
+		idx = self.ids.get(value)
+		if idx is None:
+			idx = len(self.values)
+			self.values.append(value)
+			self.ids[value] = idx
+		return idx
+
+
+class ColumnarDeck(Iterable):
+	"""
+	A deck that keeps one column per QuizItem attribute instead of a list of
+	QuizItem objects. Words are unique per card so they are kept in a plain
+	list, answers repeat a lot so they live in an interned string table, and
+	dates and difficulties live in typed arrays. QuizItems are only built when
+	the deck is iterated over, so editing a card yielded by iteration does not
+	change the deck.
+
+	Because the deck holds values rather than cards, it only offers the
+	parts of Deck's interface that don't depend on card identity: affix,
+	sort_by, search, iteration and loading and saving. There is no remove,
+	find, duplicate policy or journal.
+	"""
+
+	COLUMNS = ("word", "answer", "date_created", "date_edited", "difficulty")
+
+	def __init__(self, cards: List[QuizItem] = None, load_item: bool = True):
+		self.words: List[str] = []
+		self.answers = StringTable()
+		self.answer_ids = array('I')
+		self.dates_created = array('q')
+		self.dates_edited = array('q')
+		self.difficulties = array('q')
+		for card in [] if cards is None else cards:
+			self.affix(card)
+		if load_item:
+			self.load()
+
+	def __len__(self) -> int:
+		return len(self.difficulties)
+
+	def __iter__(self) -> Iterator:
+		return (self._materialize(i) for i in range(len(self)))
+
+	@property
+	def cards(self) -> List[QuizItem]:
+		"""
+		A fresh list of copies of the cards. Changing it doesn't change the deck
+		"""
+		return list(self)
+
+	def _materialize(self, idx: int) -> QuizItem:
+		"""
+		Build the QuizItem stored at row idx
+		"""
+		return QuizItem.from_trusted(
+			word=self.words[idx],
+			answer=self.answers[self.answer_ids[idx]],
+			difficulty=self.difficulties[idx],
+			date_created=from_timestamp(self.dates_created[idx]),
+			date_edited=from_timestamp(self.dates_edited[idx]),
+		)
+
+	def _column(self, attribute: str):
+		"""
+		Get a sequence of sortable values for attribute, one per row
+		"""
+		if attribute == "word":
+			return self.words
+		if attribute == "answer":
+			return [self.answers[i] for i in self.answer_ids]
+		if attribute == "date_created":
+			return self.dates_created
+		if attribute == "date_edited":
+			return self.dates_edited
+		return self.difficulties
+
+	def _take(self, order: List[int]) -> "ColumnarDeck":
+		"""
+		Build a new ColumnarDeck holding the rows in order. The answer table
+		is append-only so it is shared rather than copied.
+		"""
+		new_deck = ColumnarDeck(load_item=False)
+		new_deck.words = [self.words[i] for i in order]
+		new_deck.answers = self.answers
+		new_deck.answer_ids = array('I', (self.answer_ids[i] for i in order))
+		new_deck.dates_created = array('q', (self.dates_created[i] for i in order))
+		new_deck.dates_edited = array('q', (self.dates_edited[i] for i in order))
+		new_deck.difficulties = array('q', (self.difficulties[i] for i in order))
+		return new_deck
+
+	def affix(self, new_card: QuizItem) -> QuizItem:
+		"""
+		Add a card to the deck. Its values are copied into the columns, so
+		later edits to new_card don't change the deck.
+		Args:
+			new_card : card to add
+
+		Returns:
+			new_card
+		"""
+		if not isinstance(new_card, QuizItem):
+			raise TypeError("only QuizItems can be added to the deck")
+		self.words.append(new_card.word)
+		self.answer_ids.append(self.answers.intern(new_card.answer))
+		self.dates_created.append(to_timestamp(new_card.date_created))
+		self.dates_edited.append(to_timestamp(new_card.date_edited))
+		self.difficulties.append(new_card.difficulty)
+		return new_card
+
+	def _extend(self, columns: dict):
+		"""
+		Append packed columns, as read from a snapshot or sent back by
+		read_columns, straight onto ours
+		"""
+		self.words.extend(columns["word"])
+		self.answer_ids.extend(map(self.answers.intern, columns["answer"]))
+		self.dates_created.extend(columns["date_created"])
+		self.dates_edited.extend(columns["date_edited"])
+		self.difficulties.extend(columns["difficulty"])
+
+	def search(self, prefix: str = None, contains: str = None) -> List[QuizItem]:
+		"""
+		Find cards by the start of their word and/or the words in their
+		answer, ignoring case. Scans the columns rather than keeping an
+		index, and each distinct answer is only tokenized once.
+		Args:
+			prefix : only return cards whose word starts with prefix
+			contains : only return cards whose answer contains every word in
+				contains
+
+		Returns:
+			matching cards, ordered by word
+		"""
+		prefix = "" if prefix is None else prefix.lower()
+		matching_answers = None
+		if contains is not None:
+			tokens = tokenize(contains)
+			if not tokens:
+				return []
+			matching_answers = {
+				idx for idx, answer in enumerate(self.answers.values)
+				if tokens <= tokenize(answer)
+			}
+
+		rows = [
+			idx for idx, word in enumerate(self.words)
+			if word.lower().startswith(prefix)
+			and (matching_answers is None or self.answer_ids[idx] in matching_answers)
+		]
+		rows.sort(key=lambda idx: self.words[idx].lower())
+		return [self._materialize(idx) for idx in rows]
+
+	def sort_by(
+			self,
+			attribute: Union[str, List[str]],
+			reverse: bool = False,
+			in_place: bool = True
+	):
+		"""
+		Sorts our deck by attribute. Stable.
+		Args:
+			attribute : column of our deck over which we sort, or a list of
+				columns to sort by in order of priority
+			reverse : if True, sorts descending order, otherwise in ascending
+				order
+			in_place : should the deck be sorted in place.
+
+		Returns:
+			Either this deck, sorted, or a new, sorted, ColumnarDeck if in_place
+			is true or false
+		"""
+		attributes = [attribute] if isinstance(attribute, str) else list(attribute)
+		for name in attributes:
+			if name not in self.COLUMNS:
+				raise RuntimeWarning(
+					f"I don't have this attribute '{name}', dumbo. List not sorted"
+				)
+
+		if len(attributes) == 1:
+			keys = self._column(attributes[0])
+		else:
+			keys = list(zip(*(self._column(name) for name in attributes)))
+		order = sorted(range(len(self)), key=keys.__getitem__, reverse=reverse)
+		sorted_deck = self._take(order)
+		if not in_place:
+			return sorted_deck
+		self.words = sorted_deck.words
+		self.answer_ids = sorted_deck.answer_ids
+		self.dates_created = sorted_deck.dates_created
+		self.dates_edited = sorted_deck.dates_edited
+		self.difficulties = sorted_deck.difficulties
+		return self
+
+	def save_snapshot(self, file: str = "generic_file_name.pqm"):
+		"""
+		Save the columns to a binary snapshot without building any QuizItems
+		"""
+		write_snapshot(file, {
+			"word": self.words,
+			"answer": [self.answers[i] for i in self.answer_ids],
+			"date_created": self.dates_created,
+			"date_edited": self.dates_edited,
+			"difficulty": self.difficulties,
+		})
+
+	def load_snapshot(self, file: str = "generic_file_name.pqm", use_mmap: bool = True):
+		"""
+		Append the cards in a binary snapshot straight onto our columns
+		Args:
+			file : path to the snapshot
+			use_mmap : memory-map the file rather than reading it all at once
+		"""
+		self._extend(read_snapshot(file, use_mmap))
+
+	def load(
+			self,
+			file: str = "generic_file_name.csv",
+			chunk_size: int = 10_000,
+			progress: Callable[[int], None] = None
+	):
+		"""
+		Load cards from CSV File in chunks, like Deck.load
+		Args:
+			file : path to the CSV file
+			chunk_size : number of rows parsed at a time
+			progress : called with the number of cards loaded so far after
+				each chunk
+		"""
+		if not os.path.exists(file):
+			return
+		n_loaded = 0
+		for batch in Deck.read_batches(file, chunk_size):
+			for card in batch:
+				self.affix(card)
+			n_loaded += len(batch)
+			if progress is not None:
+				progress(n_loaded)
+
+	def load_many(
+			self,
+			files: List[str],
+			workers: int = None,
+			progress: Callable[[int], None] = None
+	):
+		"""
+		Load cards from many CSV files in a pool of worker processes, like
+		Deck.load_many. The packed columns the workers send back are appended
+		without building any QuizItems.
+		Args:
+			files : paths to the CSV files
+			workers : number of worker processes, defaults to the number of CPUs
+			progress : called with the number of files loaded so far after
+				each file
+		"""
+		with ProcessPoolExecutor(max_workers=workers) as pool:
+			for n_loaded, buffer in enumerate(pool.map(read_columns, files), start=1):
+				self._extend(loads(buffer))
+				if progress is not None:
+					progress(n_loaded)
+
+	def save(self, file: str = "generic_file_name.csv"):
+		"""
+		Save cards to a CSV File that Deck.load can read
+		"""
+		df = pd.DataFrame({
+			"word": self.words,
+			"answer": [self.answers[i] for i in self.answer_ids],
+			"date_created": from_timestamps(self.dates_created),
+			"date_edited": from_timestamps(self.dates_edited),
+			"difficulty": self.difficulties.tolist(),
+		})
+		df.to_csv(file, sep='~', index=False)
@@ -2,35 +2,397 @@
 Collection class for QuizItems
 """
 
+from bisect import bisect_right
 from collections.abc import Iterable
-from typing import Iterator, List, Union
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+import gc
+from operator import attrgetter
+from typing import Callable, Dict, Iterator, List, Set, Tuple, Union
+import weakref
 
 from QuizItem import QuizItem
+from DeckSnapshot import (
+	EPOCH, ONE_MICROSECOND, dumps, from_timestamps, loads, read_snapshot, to_timestamp,
+	write_snapshot
+)
+from DeckJournal import Journal
+from SearchIndex import SearchIndex
 
 import pandas as pd
 import os
 
 
+# The cards are built without validation, so every word and answer has to
+# come out of the CSV as a str. By default pandas would turn words like "NA"
+# or "None" and empty answers into float NaN.
+CSV_OPTIONS = {
+	"keep_default_na": False,
+	"na_filter": False,
+	"dtype": {"word": str, "answer": str},
+}
+
+
+def read_columns(file: str) -> bytes:
+	"""
+	Parse a `~` delimited deck CSV file into packed columns without building
+	any QuizItems. Runs in the worker processes of Deck.load_many, so the
+	result is the compact DeckSnapshot encoding rather than Python objects.
+	Args:
+		file : path to the CSV file
+
+	Returns:
+		the columns of the file packed with DeckSnapshot.dumps
+	"""
+	df = pd.read_csv(file, delimiter='~', **CSV_OPTIONS)
+	n_cards = len(df)
+	now = to_timestamp(datetime.datetime.now())
+	columns = {"word": df["word"].tolist(), "answer": df["answer"].tolist()}
+	for name in ("date_created", "date_edited"):
+		if name in df:
+			dates = pd.to_datetime(df[name]) - pd.Timestamp(EPOCH)
+			columns[name] = (dates // pd.Timedelta(ONE_MICROSECOND)).tolist()
+		else:
+			columns[name] = [now] * n_cards
+	columns["difficulty"] = df["difficulty"].tolist() if "difficulty" in df else [0] * n_cards
+	return dumps(columns)
+
+
 class Deck(Iterable):
 
-	def __init__(self, cards: List[QuizItem] = None, load_item: bool = True):
+	# What affix does with a card that matches one already in the deck:
+	#   allow : add it anyway
+	#   reject : leave the deck as it is
+	#   merge : add its difficulty to the existing card's
+	#   newest : keep the values of whichever card was edited last
+	DUPLICATE_POLICIES = ("allow", "reject", "merge", "newest")
+
+	def __init__(
+			self,
+			cards: List[QuizItem] = None,
+			load_item: bool = True,
+			journal: Journal = None,
+			duplicates: str = "allow",
+			unique_on: Tuple[str, ...] = ("word",)
+	):
+		"""
+		Args:
+			cards : cards to start the deck with
+			load_item : if True, load saved cards
+			journal : if given, saved cards are restored from this journal
+				instead of the CSV file and every later change is appended
+				to it
+			duplicates : one of DUPLICATE_POLICIES
+			unique_on : attributes that identify a duplicate card, compared
+				ignoring case and surrounding whitespace. ("word",) or
+				("word", "answer")
+		"""
+		if duplicates not in self.DUPLICATE_POLICIES:
+			raise ValueError(
+				f"duplicates must be one of {self.DUPLICATE_POLICIES}, not '{duplicates}'"
+			)
+		self.duplicates = duplicates
+		self.unique_on = tuple(unique_on)
+		# Hash index from normalized key to card, and back, used to spot duplicates
+		self._unique: Dict[tuple, QuizItem] = None
+		self._key_of: Dict[QuizItem, tuple] = None
+		if duplicates != "allow":
+			self._unique = {}
+			self._key_of = {}
+			QuizItem.watchers.add(self)
+			initial_cards, cards = cards, []
+		else:
+			initial_cards = None
+
 		self.cards: List[QuizItem] = [] if cards is None else cards
+		# Cached sort orders, keyed by the tuple of attributes sorted on
+		self._sort_indexes: Dict[Tuple[str, ...], Tuple[list, List[QuizItem]]] = {}
+		self._members: Set[int] = set()
+		# self.cards as the sort indexes last saw it, to notice when the list
+		# is changed directly instead of through affix and remove
+		self._indexed_cards: List[QuizItem] = []
+		self._search_index: SearchIndex = None
+		self.journal: Journal = None
+		# Objects like a Scheduler that are told through _card_affixed and
+		# _card_removed when cards enter or leave the deck
+		self.watchers = weakref.WeakSet()
+		for card in initial_cards or []:
+			self.affix(card)
 		if load_item:
-			self.load() 
+			self.load(journal=journal)
+		if journal is not None:
+			journal.attach(self)
+			self.journal = journal
 
 	def __iter__(self) -> Iterator:
 		return self.cards.__iter__()
 
-	def affix(self, new_card: QuizItem):
+	def __contains__(self, card: QuizItem) -> bool:
+		if self._unique is not None:
+			return self._unique_key(card) in self._unique
+		return card in self.cards
+
+	def _unique_key(self, card: QuizItem) -> tuple:
+		"""
+		Normalized values of the unique_on attributes of card
+		"""
+		return tuple(getattr(card, name).strip().casefold() for name in self.unique_on)
+
+	def find(self, word: str, answer: str = None) -> QuizItem:
+		"""
+		Look up a card by its word (and answer, if the deck is unique on both)
+		in O(1). Only available when the deck has a duplicate policy.
+
+		Returns:
+			the matching card, or None if there isn't one
+		"""
+		if self._unique is None:
+			raise RuntimeError("find needs a deck made with a duplicates policy other than 'allow'")
+		values = {"word": word, "answer": answer}
+		key = tuple(values[name].strip().casefold() for name in self.unique_on)
+		return self._unique.get(key)
+
+	def _resolve_duplicate(self, existing: QuizItem, new_card: QuizItem):
+		"""
+		Apply the duplicate policy to a new card that matches an existing one
+		"""
+		if self.duplicates == "merge":
+			existing.difficulty += new_card.difficulty
+		elif self.duplicates == "newest" and new_card.date_edited > existing.date_edited:
+			existing.word = new_card.word
+			existing.answer = new_card.answer
+			existing.difficulty = new_card.difficulty
+			existing.date_created = new_card.date_created
+			existing.date_edited = new_card.date_edited
+
+	def affix(self, new_card: QuizItem) -> QuizItem:
+		"""
+		Add a card to the deck, applying the duplicate policy
+		Args:
+			new_card : card to add
+
+		Returns:
+			the card now in the deck: new_card, or the existing card it was
+			found to duplicate
+		"""
 		if not isinstance(new_card, QuizItem):
 			raise TypeError("only QuizItems can be added to the deck")
+		if self._unique is not None:
+			key = self._unique_key(new_card)
+			existing = self._unique.get(key)
+			if existing is not None:
+				self._resolve_duplicate(existing, new_card)
+				return existing
+			self._unique[key] = new_card
+			self._key_of[new_card] = key
 		self.cards.append(new_card)
+		if self.journal is not None:
+			self.journal.record_affix(new_card)
+		if self._search_index is not None:
+			self._search_index.add(new_card)
+		if self._sort_indexes:
+			self._members.add(id(new_card))
+			self._indexed_cards.append(new_card)
+			for attributes, (keys, cards) in self._sort_indexes.items():
+				self._insert(keys, cards, attrgetter(*attributes), new_card)
+		if self.watchers:
+			for watcher in self.watchers:
+				watcher._card_affixed(new_card)
+		return new_card
+
+	def _affix_all(self, cards: List[QuizItem]):
+		"""
+		Affix a batch of new cards. When the deck has no duplicate policy,
+		journal, indexes or watchers to keep up to date, affixing is just
+		appending, so the whole batch is added in one go.
+		"""
+		if (self._unique is None and self.journal is None and not self.watchers
+				and self._search_index is None and not self._sort_indexes):
+			self.cards.extend(cards)
+		else:
+			for card in cards:
+				self.affix(card)
+
+	def remove(self, card: QuizItem) -> bool:
+		"""
+		Take a card out of the deck. Linear in the size of the deck.
+
+		Returns:
+			True if the card was in the deck
+		"""
+		try:
+			self.cards.remove(card)
+		except ValueError:
+			return False
+		if self._key_of is not None and card in self._key_of:
+			key = self._key_of.pop(card)
+			if self._unique.get(key) is card:
+				del self._unique[key]
+		if self._search_index is not None:
+			self._search_index.remove(card)
+		if id(card) in self._members:
+			self._members.discard(id(card))
+			self._indexed_cards.remove(card)
+			for keys, cards in self._sort_indexes.values():
+				idx = cards.index(card)
+				del keys[idx]
+				del cards[idx]
+		if self.journal is not None:
+			self.journal.record_remove(card)
+		if self.watchers:
+			for watcher in self.watchers:
+				watcher._card_removed(card)
+		return True
+
+	def merge(self, other: Iterable):
+		"""
+		Affix every card of another deck (or any iterable of QuizItems),
+		applying the duplicate policy. Linear in the size of other.
+		"""
+		for card in other:
+			self.affix(card)
+
+	def _card_changing(self, card: QuizItem, attribute: str, value):
+		"""
+		Called by a QuizItem before its word or answer changes. Refuses a
+		change that would make the card a duplicate of another card in a deck
+		that rejects duplicates.
+		"""
+		if (self.duplicates != "reject" or self._key_of is None
+				or attribute not in self.unique_on or card not in self._key_of):
+			return
+		values = {name: getattr(card, name) for name in self.unique_on}
+		values[attribute] = value
+		key = tuple(values[name].strip().casefold() for name in self.unique_on)
+		existing = self._unique.get(key)
+		if existing is not None and existing is not card:
+			raise ValueError(
+				f"There's already a card for {value!r} in this deck, dumbo. No duplicates allowed"
+			)
+
+	def _card_changed(self, card: QuizItem, attribute: str):
+		"""
+		Called by a QuizItem when one of its attributes changes. Moves the card
+		to its new spot in every sort index that depends on attribute and in
+		the search index.
+		Args:
+			card : the card that changed
+			attribute : name of the attribute that changed
+		"""
+		if self.journal is not None:
+			self.journal.record_change(card, attribute)
+		if self._search_index is not None and attribute in ("word", "answer"):
+			self._search_index.update(card, attribute)
+		if self._key_of is not None and attribute in self.unique_on and card in self._key_of:
+			old_key = self._key_of[card]
+			if self._unique.get(old_key) is card:
+				del self._unique[old_key]
+			new_key = self._unique_key(card)
+			existing = self._unique.get(new_key)
+			if existing is None or existing is card:
+				self._unique[new_key] = card
+				self._key_of[card] = new_key
+			elif self.duplicates == "merge":
+				# The edited card is folded into the one that already had its key
+				existing.difficulty += card.difficulty
+				self.remove(card)
+			elif self.duplicates == "newest":
+				# The edited card is the newest, so it replaces the other one
+				self.remove(existing)
+				self._unique[new_key] = card
+				self._key_of[card] = new_key
+			# A reject deck refuses the change in _card_changing, so the
+			# existing card is never displaced here
+		if id(card) not in self._members:
+			return
+		for attributes, (keys, cards) in self._sort_indexes.items():
+			if attribute in attributes:
+				idx = cards.index(card)
+				del keys[idx]
+				del cards[idx]
+				self._insert(keys, cards, attrgetter(*attributes), card)
+
+	@staticmethod
+	def _insert(keys: list, cards: List[QuizItem], key, card: QuizItem):
+		"""
+		Insert card into a sort index after any cards with an equal key
+		"""
+		card_key = key(card)
+		idx = bisect_right(keys, card_key)
+		keys.insert(idx, card_key)
+		cards.insert(idx, card)
+
+	def _sort_index(self, attributes: Tuple[str, ...]) -> Tuple[list, List[QuizItem]]:
+		"""
+		Get the cached sort index for attributes, building it if needed. A sort
+		index is the list of cards in ascending order along with their keys.
+		"""
+		if self._sort_indexes and not self._sort_indexes_current():
+			# Cards were added to or taken out of self.cards directly
+			self._sort_indexes = {}
+			self._members = set()
+			self._indexed_cards = []
+		if attributes in self._sort_indexes:
+			return self._sort_indexes[attributes]
+
+		for attribute in attributes:
+			if not all([hasattr(card, attribute) for card in self.cards]):
+				raise RuntimeWarning(
+					f"I don't have this attribute '{attribute}', dumbo. List not sorted"
+				)
+
+		key = attrgetter(*attributes)
+		all_keys = [key(card) for card in self.cards]
+		order = sorted(range(len(self.cards)), key=all_keys.__getitem__)
+		index = ([all_keys[i] for i in order], [self.cards[i] for i in order])
+
+		# Start listening for changes to our cards
+		if not self._sort_indexes:
+			self._members = {id(card) for card in self.cards}
+			self._indexed_cards = self.cards[:]
+			QuizItem.watchers.add(self)
+		self._sort_indexes[attributes] = index
+		return index
+
+	def _sort_indexes_current(self) -> bool:
+		"""
+		Whether the cached sort indexes hold exactly the cards in self.cards.
+		affix and remove keep them up to date, but self.cards is a plain list
+		that can also be changed directly.
+		"""
+		# QuizItems compare by identity, so this is a cheap pointer comparison
+		return self.cards == self._indexed_cards
 
-	def sort_by(self, attribute: str, reverse: bool = False, in_place: bool = True):
+	@staticmethod
+	def _descending(keys: list, cards: List[QuizItem]) -> List[QuizItem]:
 		"""
-		Sorts our deck by attribute. Stable.
+		Turn an ascending sort index into a stable descending order by reversing
+		the runs of equal keys while keeping the order within each run.
+		"""
+		descending = []
+		end = len(cards)
+		while end > 0:
+			start = end - 1
+			while start > 0 and keys[start - 1] == keys[end - 1]:
+				start -= 1
+			descending.extend(cards[start:end])
+			end = start
+		return descending
+
+	def sort_by(
+			self,
+			attribute: Union[str, List[str]],
+			reverse: bool = False,
+			in_place: bool = True
+	):
+		"""
+		Sorts our deck by attribute. Stable. The sorted order for each
+		attribute (or list of attributes) is cached and kept up to date as
+		cards are affixed or edited, so repeatedly switching between views of
+		the deck only costs a copy of the list.
 		Args:
-			attribute : attribute of our QuizItems over which we sort
+			attribute : attribute of our QuizItems over which we sort, or a
+				list of attributes to sort by in order of priority
 			reverse : if True, sorts descending order, otherwise in ascending
 				order
 			in_place : should the deck be sorted in place.
@@ -38,44 +400,186 @@ class Deck(Iterable):
 		Returns:
 			Either None, or a new, sorted, Deck object if in_place is true or false
 		"""
-		if not all([hasattr(card, attribute) for card in self.cards]):
-			raise RuntimeWarning(
-				f"I don't have this attribute '{attribute}', dumbo. List not sorted"
-			)
-			return self
+		attributes = (attribute,) if isinstance(attribute, str) else tuple(attribute)
+		keys, cards = self._sort_index(attributes)
+		ordered = self._descending(keys, cards) if reverse else cards[:]
 
 		if in_place:
-			self.cards.sort(
-				key=lambda card: getattr(card, attribute),
-				reverse=reverse
-			)
+			self.cards[:] = ordered
+			self._indexed_cards = ordered
 			return self
 		else:
-			return Deck(sorted(
-				self.cards,
-				key=lambda card: getattr(card, attribute),
-				reverse=reverse
-			))
-        
-	def load(self):
+			return Deck(ordered, load_item=False)
+
+	def search(self, prefix: str = None, contains: str = None) -> List[QuizItem]:
 		"""
-		Load cards from CSV File as pandas dataframe
-		Columns: word, answer, Date created, date edited, difficulty 
+		Find cards by the start of their word and/or the words in their
+		answer, ignoring case. The search index is built on the first search
+		and kept up to date as cards are affixed or edited.
+		Args:
+			prefix : only return cards whose word starts with prefix
+			contains : only return cards whose answer contains every word in
+				contains
+
+		Returns:
+			matching cards, ordered by word
 		"""
-		file = "generic_file_name.csv"
-		if os.path.exists(file):
-			df = pd.read_csv(file, delimiter='~')
-			for index, row in df.iterrows():
-				self.affix(QuizItem(**dict(row)))
-    
-	def save(self):
+		if self._search_index is None:
+			self._search_index = SearchIndex(self.cards)
+			QuizItem.watchers.add(self)
+
+		if prefix is None and contains is None:
+			return self.search(prefix="")
+		if contains is None:
+			return self._search_index.with_prefix(prefix)
+		matches = self._search_index.containing(contains)
+		if prefix is None:
+			return sorted(matches, key=lambda card: card.word.lower())
+
+		# Filter whichever of the two result sets is smaller
+		start, end = self._search_index.prefix_range(prefix)
+		if end - start <= len(matches):
+			return [
+				card for card in self._search_index.word_cards[start:end]
+				if card in matches
+			]
+		prefix = prefix.lower()
+		return sorted(
+			(card for card in matches if card.word.lower().startswith(prefix)),
+			key=lambda card: card.word.lower()
+		)
+
+	@staticmethod
+	def read_batches(file: str, chunk_size: int = 10_000) -> Iterator[List[QuizItem]]:
+		"""
+		Stream cards out of a `~` delimited CSV file a chunk at a time. Dates
+		are parsed once per column of each chunk rather than once per card.
+		Args:
+			file : path to the CSV file
+			chunk_size : number of rows read per chunk. Bounds the memory used
+				while parsing
+
+		Yields:
+			lists of at most chunk_size QuizItems
+		"""
+		for chunk in pd.read_csv(file, delimiter='~', chunksize=chunk_size, **CSV_OPTIONS):
+			for column in ("date_created", "date_edited"):
+				if column in chunk:
+					chunk[column] = pd.to_datetime(chunk[column])
+			columns = {name: chunk[name].tolist() for name in chunk.columns}
+			yield QuizItem.batch_from_trusted(
+				columns["word"],
+				columns["answer"],
+				columns.get("difficulty"),
+				columns.get("date_created"),
+				columns.get("date_edited")
+			)
+
+	def load(
+			self,
+			file: str = "generic_file_name.csv",
+			chunk_size: int = 10_000,
+			progress: Callable[[int], None] = None,
+			journal: Journal = None
+	):
+		"""
+		Load cards from CSV File in chunks
+		Columns: word, answer, Date created, date edited, difficulty
+		Args:
+			file : path to the CSV file
+			chunk_size : number of rows parsed at a time. Smaller chunks use
+				less memory while loading
+			progress : called with the number of cards loaded so far after
+				each chunk
+			journal : if given, ignore the CSV file and restore the cards from
+				the journal's snapshot and records instead
+		"""
+		if journal is not None:
+			journal.replay(self)
+			return
+		if not os.path.exists(file):
+			return
+		n_loaded = 0
+		for batch in self.read_batches(file, chunk_size):
+			for card in batch:
+				self.affix(card)
+			n_loaded += len(batch)
+			if progress is not None:
+				progress(n_loaded)
+
+	def load_many(
+			self,
+			files: List[str],
+			workers: int = None,
+			progress: Callable[[int], None] = None
+	):
+		"""
+		Load cards from many CSV files, parsing them in parallel in a pool of
+		worker processes. Workers send back packed columns, which are much
+		cheaper to pickle than QuizItems, and the cards are affixed in the
+		order of files.
+		Args:
+			files : paths to the CSV files
+			workers : number of worker processes, defaults to the number of CPUs
+			progress : called with the number of files loaded so far after
+				each file
+		"""
+		with ProcessPoolExecutor(max_workers=workers) as pool:
+			for n_loaded, buffer in enumerate(pool.map(read_columns, files), start=1):
+				columns = loads(buffer)
+				self._affix_all(QuizItem.batch_from_trusted(
+					columns["word"],
+					columns["answer"],
+					columns["difficulty"],
+					from_timestamps(columns["date_created"]),
+					from_timestamps(columns["date_edited"])
+				))
+				if progress is not None:
+					progress(n_loaded)
+
+	def save(self, file: str = "generic_file_name.csv"):
 		"""
 		Save cards to CSV File
 		"""
-		file = "generic_file_name.csv"
 		dict_to_save = {slot.replace("__",""):[] for slot in QuizItem.__slots__}
 		for card in self.cards: 
 			for key in dict_to_save.keys():
 				dict_to_save[key].append(getattr(card, key))
-		df = pd.DataFrame(dict_to_save, delimiter='~')
-		df.to_csv(file, index=False)
\ No newline at end of file
+		df = pd.DataFrame(dict_to_save)
+		df.to_csv(file, sep='~', index=False)
+
+	def save_snapshot(self, file: str = "generic_file_name.pqm"):
+		"""
+		Save cards to a binary snapshot, which loads much faster than the CSV
+		"""
+		write_snapshot(file, {
+			"word": [card.word for card in self.cards],
+			"answer": [card.answer for card in self.cards],
+			"date_created": [to_timestamp(card.date_created) for card in self.cards],
+			"date_edited": [to_timestamp(card.date_edited) for card in self.cards],
+			"difficulty": [card.difficulty for card in self.cards],
+		})
+
+	def load_snapshot(self, file: str = "generic_file_name.pqm", use_mmap: bool = True):
+		"""
+		Load cards from a binary snapshot written by save_snapshot
+		Args:
+			file : path to the snapshot
+			use_mmap : memory-map the file rather than reading it all at once
+		"""
+		columns = read_snapshot(file, use_mmap)
+		# Building this many objects at once sets off the cyclic garbage
+		# collector over and over for nothing, since cards have no cycles
+		gc_was_enabled = gc.isenabled()
+		gc.disable()
+		try:
+			self._affix_all(QuizItem.batch_from_trusted(
+				columns["word"],
+				columns["answer"],
+				columns["difficulty"],
+				from_timestamps(columns["date_created"]),
+				from_timestamps(columns["date_edited"])
+			))
+		finally:
+			if gc_was_enabled:
+				gc.enable()
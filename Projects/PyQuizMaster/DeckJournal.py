@@ -0,0 +1,252 @@
+"""
+Append-only journal of Deck edits with background compaction
+
+The journal is a series of generations. Generation g is an optional binary
+snapshot `<prefix>.<g>.pqm` followed by a journal `<prefix>.<g>.journal`
+of JSON records, one per line, describing what happened after it:
+	["affix", word, answer, difficulty, date_created, date_edited]
+	["set", row, attribute, value]
+	["remove", row]
+Rows number cards in the order they entered the journal and dates are
+integer timestamps. Once a journal grows past max_size a new generation is
+started and the snapshot for it is written by a background thread. Older
+generations are only deleted after the new snapshot is safely in place, so
+a crash at any point can be recovered by loading the newest snapshot and
+replaying every journal from there on.
+"""
+
+import glob
+import json
+import os
+import threading
+from typing import Dict, List
+
+from QuizItem import QuizItem
+from DeckSnapshot import from_timestamp, to_timestamp, write_snapshot
+
+
+DATE_ATTRIBUTES = ("date_created", "date_edited")
+
+
+class Journal:
+	"""
+	Records the affix and edit operations made on a Deck so that saving
+	after each change only costs an appended line
+	"""
+
+	def __init__(self, prefix: str = "generic_file_name", max_size: int = 1 << 20):
+		"""
+		Args:
+			prefix : path prefix shared by the snapshot and journal files
+			max_size : size in bytes a journal may reach before it is
+				compacted into a fresh snapshot
+		"""
+		self.prefix = prefix
+		self.max_size = max_size
+		self.generation = 0
+		self.valid_size = 0
+		# Whether replay has read the files on disk into a deck. Only then do
+		# we know where the valid records end.
+		self.replayed = False
+		self.file = None
+		self.compactor: threading.Thread = None
+		self.rows: List[QuizItem] = []
+		self.row_of: Dict[int, int] = {}
+
+	def snapshot_file(self, generation: int) -> str:
+		return f"{self.prefix}.{generation}.pqm"
+
+	def journal_file(self, generation: int) -> str:
+		return f"{self.prefix}.{generation}.journal"
+
+	def _generations(self, extension: str) -> List[int]:
+		"""
+		Generation numbers of the files on disk with the given extension
+		"""
+		generations = []
+		for file in glob.glob(f"{glob.escape(self.prefix)}.*.{extension}"):
+			generation = file[len(self.prefix) + 1:-len(extension) - 1]
+			if generation.isdigit():
+				generations.append(int(generation))
+		return generations
+
+	def replay(self, deck):
+		"""
+		Restore deck from the newest snapshot and every journal after it
+		Args:
+			deck : Deck to load the cards into
+		"""
+		n_before = len(deck.cards)
+		snapshots = self._generations("pqm")
+		self.generation = max(snapshots, default=0)
+		if self.generation in snapshots:
+			deck.load_snapshot(self.snapshot_file(self.generation))
+		self.rows = deck.cards[n_before:]
+
+		generation = self.generation
+		while os.path.exists(self.journal_file(generation)):
+			if generation > self.generation:
+				# compact() renumbered the rows when it started this
+				# generation, whether or not its snapshot got written
+				self.rows = [card for card in self.rows if card is not None]
+			self.generation = generation
+			self.valid_size = 0
+			with open(self.journal_file(generation), "rb") as f:
+				for line in f:
+					# A crash mid-write can leave a partial last line
+					if not line.endswith(b"\n"):
+						break
+					self._apply(deck, json.loads(line))
+					self.valid_size += len(line)
+			generation += 1
+
+		self.row_of = {
+			id(card): row for row, card in enumerate(self.rows) if card is not None
+		}
+		self.replayed = True
+
+	def _apply(self, deck, record: list):
+		"""
+		Redo a single journal record on deck
+		"""
+		if record[0] == "affix":
+			_, word, answer, difficulty, date_created, date_edited = record
+			card = QuizItem.from_trusted(
+				word,
+				answer,
+				difficulty=difficulty,
+				date_created=from_timestamp(date_created),
+				date_edited=from_timestamp(date_edited)
+			)
+			deck.affix(card)
+			self.rows.append(card)
+		elif record[0] == "remove":
+			_, row = record
+			card, self.rows[row] = self.rows[row], None
+			# Replaying the edit that caused the removal may have removed it already
+			if card is not None:
+				deck.remove(card)
+		else:
+			_, row, attribute, value = record
+			if attribute in DATE_ATTRIBUTES:
+				value = from_timestamp(value)
+			try:
+				setattr(self.rows[row], attribute, value)
+			except ValueError:
+				# A journal written under another duplicates policy can have
+				# an edit this deck rejects. Drop the edited card, like a
+				# rejected affix
+				deck.remove(self.rows[row])
+
+	def attach(self, deck):
+		"""
+		Start recording changes to deck. Cards already in the deck that did
+		not come from the journal are recorded as new cards. A journal that
+		already has records on disk must be replayed into the deck first,
+		otherwise they would be lost or mixed up with the deck's cards.
+		"""
+		journal_file = self.journal_file(self.generation)
+		if self.replayed:
+			# Drop a partial last record left by a crash
+			if os.path.exists(journal_file):
+				os.truncate(journal_file, self.valid_size)
+		elif self._generations("pqm") or any(
+				os.path.getsize(self.journal_file(generation)) > 0
+				for generation in self._generations("journal")
+		):
+			raise RuntimeError(
+				f"The journal at {self.prefix} already has cards in it, dumbo. "
+				f"Replay it into the deck before attaching"
+			)
+		self.file = open(journal_file, "a")
+		for card in deck.cards:
+			if id(card) not in self.row_of:
+				self.record_affix(card)
+		QuizItem.watchers.add(deck)
+
+	def record_affix(self, card: QuizItem):
+		self.row_of[id(card)] = len(self.rows)
+		self.rows.append(card)
+		self._write([
+			"affix",
+			card.word,
+			card.answer,
+			card.difficulty,
+			to_timestamp(card.date_created),
+			to_timestamp(card.date_edited)
+		])
+
+	def record_change(self, card: QuizItem, attribute: str):
+		row = self.row_of.get(id(card))
+		if row is None:
+			return
+		value = getattr(card, attribute)
+		if attribute in DATE_ATTRIBUTES:
+			value = to_timestamp(value)
+		self._write(["set", row, attribute, value])
+
+	def record_remove(self, card: QuizItem):
+		row = self.row_of.pop(id(card), None)
+		if row is None:
+			return
+		self.rows[row] = None
+		self._write(["remove", row])
+
+	def _write(self, record: list):
+		self.file.write(json.dumps(record) + "\n")
+		self.file.flush()
+		if self.file.tell() >= self.max_size:
+			self.compact()
+
+	def compact(self):
+		"""
+		Start a new generation and write its snapshot in the background. The
+		card values are copied here so the deck can keep changing while the
+		snapshot is written.
+		"""
+		if self.compactor is not None:
+			self.compactor.join()
+
+		# Removed cards are left out of the snapshot, which renumbers the rows
+		self.rows = [card for card in self.rows if card is not None]
+		self.row_of = {id(card): row for row, card in enumerate(self.rows)}
+		columns = {
+			"word": [card.word for card in self.rows],
+			"answer": [card.answer for card in self.rows],
+			"date_created": [to_timestamp(card.date_created) for card in self.rows],
+			"date_edited": [to_timestamp(card.date_edited) for card in self.rows],
+			"difficulty": [card.difficulty for card in self.rows],
+		}
+		self.file.close()
+		self.generation += 1
+		self.file = open(self.journal_file(self.generation), "a")
+
+		self.compactor = threading.Thread(
+			target=self._write_snapshot,
+			args=(self.generation, columns)
+		)
+		self.compactor.start()
+
+	def _write_snapshot(self, generation: int, columns: dict):
+		"""
+		Write the snapshot for generation, then delete older generations
+		"""
+		tmp_file = self.snapshot_file(generation) + ".tmp"
+		write_snapshot(tmp_file, columns)
+		os.replace(tmp_file, self.snapshot_file(generation))
+		for old in self._generations("pqm"):
+			if old < generation:
+				os.remove(self.snapshot_file(old))
+		for old in self._generations("journal"):
+			if old < generation:
+				os.remove(self.journal_file(old))
+
+	def close(self):
+		"""
+		Wait for any compaction to finish and close the journal file
+		"""
+		if self.compactor is not None:
+			self.compactor.join()
+		if self.file is not None:
+			self.file.close()
+			self.file = None
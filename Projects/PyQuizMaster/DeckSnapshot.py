@@ -0,0 +1,193 @@
+"""
+Compact binary snapshot format for decks
+
+Layout (all integers little-endian):
+	header : magic b"PQMD", uint16 version, uint64 number of cards n
+	date_created : n int64 microseconds since the epoch
+	date_edited : n int64 microseconds since the epoch
+	difficulty : n int64
+	word : n uint32 lengths (in characters), uint64 blob size, utf-8 blob of
+		the words separated by NUL characters
+	answer : same as word
+
+Every column is a contiguous block so it can be read with a single
+array.frombytes call, optionally straight out of a memory map. The NUL
+separators let string columns be cut up with one str.split; the lengths
+are only needed when a string itself contains NUL.
+"""
+
+from array import array
+from itertools import accumulate
+import datetime
+import io
+import mmap
+import os
+import struct
+import sys
+from typing import BinaryIO, Dict, List, Sequence
+
+
+MAGIC = b"PQMD"
+VERSION = 1
+HEADER = struct.Struct("<4sHQ")
+BLOB_SIZE = struct.Struct("<Q")
+INT_COLUMNS = ("date_created", "date_edited", "difficulty")
+STR_COLUMNS = ("word", "answer")
+
+EPOCH = datetime.datetime(1970, 1, 1)
+ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def to_timestamp(value: datetime.datetime) -> int:
+	"""
+	Convert a naive datetime to integer microseconds since the epoch
+	"""
+	return (value - EPOCH) // ONE_MICROSECOND
+
+
+def from_timestamp(value: int) -> datetime.datetime:
+	"""
+	Convert integer microseconds since the epoch back to a datetime
+	"""
+	return EPOCH + datetime.timedelta(microseconds=value)
+
+
+def from_timestamps(values: Sequence[int]) -> List[datetime.datetime]:
+	"""
+	Convert a column of timestamps to datetimes. Uses numpy when it is
+	installed, which converts the whole column in C instead of one
+	timedelta at a time.
+	"""
+	try:
+		import numpy as np
+	except ImportError:
+		return list(map(from_timestamp, values))
+	return np.asarray(values, dtype=np.int64).astype("datetime64[us]").astype(object).tolist()
+
+
+def _little_endian(values: array) -> array:
+	"""
+	Byteswap values in place on big-endian machines so files are portable
+	"""
+	if sys.byteorder != "little":
+		values.byteswap()
+	return values
+
+
+def dump(stream: BinaryIO, columns: Dict[str, Sequence]):
+	"""
+	Write deck columns in the snapshot format to a binary stream
+	Args:
+		stream : open binary file or buffer
+		columns : maps each of word, answer, date_created, date_edited and
+			difficulty to a sequence with one value per card. Dates are
+			integer timestamps from to_timestamp
+	"""
+	n_cards = len(columns["difficulty"])
+	stream.write(HEADER.pack(MAGIC, VERSION, n_cards))
+	for name in INT_COLUMNS:
+		stream.write(_little_endian(array('q', columns[name])).tobytes())
+	for name in STR_COLUMNS:
+		values = columns[name]
+		blob = "\0".join(values).encode()
+		stream.write(_little_endian(array('I', map(len, values))).tobytes())
+		stream.write(BLOB_SIZE.pack(len(blob)))
+		stream.write(blob)
+
+
+def dumps(columns: Dict[str, Sequence]) -> bytes:
+	"""
+	Pack deck columns into bytes in the snapshot format, e.g. to send them
+	between processes
+	"""
+	stream = io.BytesIO()
+	dump(stream, columns)
+	return stream.getvalue()
+
+
+def loads(buffer: bytes) -> Dict[str, Sequence]:
+	"""
+	Unpack deck columns from bytes made by dumps
+	"""
+	return _parse(buffer, "buffer")
+
+
+def write_snapshot(file: str, columns: Dict[str, Sequence]):
+	"""
+	Write a deck to a binary snapshot file
+	Args:
+		file : path of the snapshot to write
+		columns : deck columns, as for dump
+	"""
+	with open(file, "wb") as f:
+		dump(f, columns)
+
+
+def read_snapshot(file: str, use_mmap: bool = True) -> Dict[str, Sequence]:
+	"""
+	Read the columns of a binary snapshot file
+	Args:
+		file : path of the snapshot to read
+		use_mmap : if True, memory-map the file instead of reading it into
+			memory in one go
+
+	Returns:
+		dict mapping word and answer to lists of str, and date_created,
+		date_edited and difficulty to int64 arrays
+	"""
+	if os.path.getsize(file) < HEADER.size:
+		raise ValueError(f"{file} is too small to be a deck snapshot")
+
+	with open(file, "rb") as f:
+		buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if use_mmap else f.read()
+		try:
+			return _parse(buffer, file)
+		finally:
+			if use_mmap:
+				buffer.close()
+
+
+def _parse(buffer, file: str) -> Dict[str, Sequence]:
+	"""
+	Split a snapshot buffer into its columns
+	"""
+	magic, version, n_cards = HEADER.unpack(buffer[:HEADER.size])
+	if magic != MAGIC:
+		raise ValueError(f"{file} is not a deck snapshot")
+	if version != VERSION:
+		raise ValueError(
+			f"{file} is snapshot version {version}, only version {VERSION} is supported"
+		)
+
+	columns = {}
+	offset = HEADER.size
+	for name in INT_COLUMNS:
+		values = array('q')
+		values.frombytes(buffer[offset:offset + 8 * n_cards])
+		columns[name] = _little_endian(values)
+		offset += 8 * n_cards
+
+	for name in STR_COLUMNS:
+		lengths = array('I')
+		lengths.frombytes(buffer[offset:offset + 4 * n_cards])
+		_little_endian(lengths)
+		offset += 4 * n_cards
+		(blob_size,) = BLOB_SIZE.unpack(buffer[offset:offset + BLOB_SIZE.size])
+		offset += BLOB_SIZE.size
+		text = buffer[offset:offset + blob_size].decode()
+		offset += blob_size
+		values = text.split("\0")
+		if len(values) != n_cards:
+			# Some string contains a NUL, so fall back on the lengths
+			values = _split(text, lengths)
+		columns[name] = values
+
+	return columns
+
+
+def _split(text: str, lengths: Sequence[int]) -> List[str]:
+	"""
+	Cut a NUL separated string back into pieces of the given lengths
+	"""
+	starts = accumulate((length + 1 for length in lengths), initial=0)
+	return [text[start:start + length] for start, length in zip(starts, lengths)]
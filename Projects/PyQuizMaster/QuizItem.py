@@ -1,6 +1,8 @@
 # The QuizItem Class
 
 import datetime
+from itertools import repeat
+import weakref
 
 
 class QuizItem:
@@ -12,21 +14,75 @@ class QuizItem:
     """
 
     __slots__ = ('__word', '__answer', '__date_created', '__date_edited', '__difficulty')
+
+    # Decks that keep sort indexes over their cards and need to hear about edits
+    watchers = weakref.WeakSet()
     
     def __init__(self, word, answer, difficulty=0, date_created=None, date_edited=None):
         
-        self.date_created = date_created if date_created is not None else datetime.datetime.now()
-        self.date_edited = date_edited if date_edited is not None else datetime.datetime.now()
-
+        # Set word and answer first since their setters touch date_edited
         self.word = word
         self.answer = answer
         self.__difficulty = difficulty
+
+        self.date_created = date_created if date_created is not None else datetime.datetime.now()
+        self.date_edited = date_edited if date_edited is not None else datetime.datetime.now()
         
 
+    @classmethod
+    def from_trusted(cls, word, answer, difficulty=0, date_created=None, date_edited=None):
+        """
+        Build a QuizItem straight from already validated values, e.g. ones read
+        back from a saved deck. Skips the type checks and timestamps done by the
+        property setters, so only use it on data we wrote ourselves.
+        """
+        if date_created is None or date_edited is None:
+            now = datetime.datetime.now()
+            date_created = now if date_created is None else date_created
+            date_edited = now if date_edited is None else date_edited
+        card = cls.__new__(cls)
+        card.__word = word
+        card.__answer = answer
+        card.__difficulty = difficulty
+        card.__date_created = date_created
+        card.__date_edited = date_edited
+        return card
+
+    @classmethod
+    def batch_from_trusted(cls, words, answers, difficulties=None, dates_created=None, dates_edited=None):
+        """
+        Build a list of QuizItems from columns of trusted values with
+        from_trusted. Missing columns are filled with difficulty 0 and a single
+        timestamp shared by the whole batch.
+        """
+        now = datetime.datetime.now()
+        difficulties = repeat(0) if difficulties is None else difficulties
+        dates_created = repeat(now) if dates_created is None else dates_created
+        dates_edited = repeat(now) if dates_edited is None else dates_edited
+        new = cls.__new__
+        cards = []
+        for word, answer, difficulty, date_created, date_edited in zip(
+                words, answers, difficulties, dates_created, dates_edited):
+            card = new(cls)
+            card.__word = word
+            card.__answer = answer
+            card.__difficulty = difficulty
+            card.__date_created = date_created
+            card.__date_edited = date_edited
+            cards.append(card)
+        return cards
+
     @property
     def difficulty(self):
         return self.__difficulty
 
+    @difficulty.setter
+    def difficulty(self, value):
+        if not isinstance(value, int):
+            raise TypeError(f"No u dummy difficulty is soposed to be a whole number, not {value!r}")
+        self.__difficulty = value
+        self._notify("difficulty")
+
     @property
     def word(self):
         return self.__word
@@ -36,8 +92,10 @@ class QuizItem:
         if not isinstance(new_word, str):
             raise TypeError("U DUmboo, Wowww I cannot workd in an environment with that kind of "
                             "h*te speach just thrown around. Los*r")
-        self.date_edited = datetime.datetime.now()
+        self._check_change("word", new_word)
         self.__word = new_word
+        self._notify("word")
+        self.date_edited = datetime.datetime.now()
 
     @property
     def answer(self):
@@ -48,8 +106,10 @@ class QuizItem:
         if not isinstance(new_answer, str):
             raise TypeError("U DUmboo, Wowww I cannot workd in an environment with that kind of "
                             "h*te speach just thrown around. Los*r")
-        self.date_edited = datetime.datetime.now()
+        self._check_change("answer", new_answer)
         self.__answer = new_answer
+        self._notify("answer")
+        self.date_edited = datetime.datetime.now()
 
     @property
     def date_created(self):
@@ -66,6 +126,7 @@ class QuizItem:
             self.__date_created = value
         else:
             self.__date_created = value
+        self._notify("date_created")
 
     @property
     def date_edited(self):
@@ -82,9 +143,30 @@ class QuizItem:
             self.__date_edited = value
         else:
             self.__date_edited = value
+        self._notify("date_edited")
          
     def update_difficulty(self, correct: bool):
         self.__difficulty += int(not correct)
+        self._notify("difficulty")
+
+    def _check_change(self, attribute, value):
+        """
+        Let any watching Decks veto a change before it is made, e.g. one that
+        would make the card a duplicate in a deck that rejects duplicates
+        """
+        if QuizItem.watchers:
+            for deck in QuizItem.watchers:
+                check = getattr(deck, "_card_changing", None)
+                if check is not None:
+                    check(self, attribute, value)
+
+    def _notify(self, attribute):
+        """
+        Let any watching Decks know that attribute has changed
+        """
+        if QuizItem.watchers:
+            for deck in QuizItem.watchers:
+                deck._card_changed(self, attribute)
         
     def __repr__(self):
         return (f"QuizItem(word={self.word}, "
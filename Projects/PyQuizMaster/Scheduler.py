@@ -0,0 +1,179 @@
+"""
+Spaced-repetition scheduler for the cards in a Deck
+"""
+
+import datetime
+from typing import Callable, Dict, List
+
+from QuizItem import QuizItem
+from Deck import Deck
+from DeckSnapshot import to_timestamp
+
+
+class Scheduler:
+	"""
+	Picks the next card to ask from a Deck. Every card is due some time after
+	it was last edited or answered, and harder cards come due sooner. Cards
+	are kept in an indexed binary heap ordered by (due time, -difficulty), so
+	picking the next card is O(1) and rescheduling a card after an answer or a
+	difficulty change is O(log n).
+
+	The scheduler follows its deck: cards affixed to or removed from the
+	deck with Deck.affix and Deck.remove are added to or dropped from the
+	schedule. Editing a card counts as seeing it, so it is rescheduled from
+	its new date_edited.
+	"""
+
+	def __init__(
+			self,
+			deck: Deck,
+			review_interval: datetime.timedelta = datetime.timedelta(days=1),
+			clock: Callable[[], datetime.datetime] = datetime.datetime.now
+	):
+		"""
+		Args:
+			deck : the cards to schedule
+			review_interval : how long after being seen a card with difficulty
+				0 comes due again. A card with difficulty d comes due after
+				review_interval / (1 + d)
+			clock : returns the current time
+		"""
+		self.review_interval = review_interval
+		self.clock = clock
+		# Heap entries are [due timestamp, -difficulty, card]
+		self.heap: List[list] = []
+		for card in deck:
+			self.heap.append([self._due(card.date_edited, card.difficulty), -card.difficulty, card])
+		self.heap.sort(key=lambda entry: entry[:2])
+		self.position: Dict[int, int] = {
+			id(entry[2]): i for i, entry in enumerate(self.heap)
+		}
+		QuizItem.watchers.add(self)
+		deck.watchers.add(self)
+
+	def __len__(self) -> int:
+		return len(self.heap)
+
+	def _due(self, last_seen: datetime.datetime, difficulty: int) -> int:
+		"""
+		Timestamp at which a card last seen at last_seen comes due
+		"""
+		return to_timestamp(last_seen + self.review_interval / (1 + difficulty))
+
+	def add(self, card: QuizItem):
+		"""
+		Start scheduling a card. Cards affixed to the deck are added
+		automatically.
+		"""
+		if id(card) in self.position:
+			return
+		self.position[id(card)] = len(self.heap)
+		self.heap.append([self._due(card.date_edited, card.difficulty), -card.difficulty, card])
+		self._sift_up(len(self.heap) - 1)
+
+	def remove(self, card: QuizItem) -> bool:
+		"""
+		Stop scheduling a card. Cards removed from the deck are removed
+		automatically.
+
+		Returns:
+			True if the card was scheduled
+		"""
+		idx = self.position.pop(id(card), None)
+		if idx is None:
+			return False
+		last = self.heap.pop()
+		if idx < len(self.heap):
+			self.heap[idx] = last
+			self.position[id(last[2])] = idx
+			self._fix(idx)
+		return True
+
+	def _card_affixed(self, card: QuizItem):
+		self.add(card)
+
+	def _card_removed(self, card: QuizItem):
+		self.remove(card)
+
+	def next_card(self) -> QuizItem:
+		"""
+		The card that should be asked next: the one that has been due the
+		longest, with ties going to the hardest card
+		"""
+		if not self.heap:
+			raise IndexError("there are no cards to schedule")
+		return self.heap[0][2]
+
+	def answer(self, card: QuizItem, correct: bool):
+		"""
+		Record an answer to card and schedule when it should be asked again
+		Args:
+			card : the card that was asked
+			correct : whether it was answered correctly
+		"""
+		card.update_difficulty(correct)
+		self.reschedule(card, self._due(self.clock(), card.difficulty))
+
+	def reschedule(self, card: QuizItem, due: int):
+		"""
+		Move card to a new due timestamp
+		"""
+		idx = self.position[id(card)]
+		self.heap[idx][0] = due
+		self._fix(idx)
+
+	def _card_changed(self, card: QuizItem, attribute: str):
+		"""
+		Called by a QuizItem when one of its attributes changes. Keeps the
+		heap ordered when a card's difficulty changes outside of answer, and
+		reschedules a card from its new date_edited when it is edited.
+		"""
+		if attribute not in ("difficulty", "date_edited"):
+			return
+		idx = self.position.get(id(card))
+		if idx is None:
+			return
+		if attribute == "difficulty":
+			self.heap[idx][1] = -card.difficulty
+		else:
+			self.heap[idx][0] = self._due(card.date_edited, card.difficulty)
+		self._fix(idx)
+
+	def _less(self, i: int, j: int) -> bool:
+		a, b = self.heap[i], self.heap[j]
+		return (a[0], a[1]) < (b[0], b[1])
+
+	def _swap(self, i: int, j: int):
+		heap = self.heap
+		heap[i], heap[j] = heap[j], heap[i]
+		self.position[id(heap[i][2])] = i
+		self.position[id(heap[j][2])] = j
+
+	def _fix(self, idx: int):
+		"""
+		Restore the heap order around an entry whose key changed
+		"""
+		if idx > 0 and self._less(idx, (idx - 1) // 2):
+			self._sift_up(idx)
+		else:
+			self._sift_down(idx)
+
+	def _sift_up(self, idx: int):
+		while idx > 0:
+			parent = (idx - 1) // 2
+			if not self._less(idx, parent):
+				break
+			self._swap(idx, parent)
+			idx = parent
+
+	def _sift_down(self, idx: int):
+		size = len(self.heap)
+		while True:
+			smallest = idx
+			for child in (2 * idx + 1, 2 * idx + 2):
+				if child < size and self._less(child, smallest):
+					smallest = child
+			if smallest == idx:
+				break
+			self._swap(idx, smallest)
+			idx = smallest
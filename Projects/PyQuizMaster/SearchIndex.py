@@ -0,0 +1,140 @@
+"""
+Word prefix and answer text search over QuizItems
+"""
+
+from bisect import bisect_left
+from functools import lru_cache
+import re
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from QuizItem import QuizItem
+
+
+TOKEN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=1 << 16)
+def tokenize(text: str) -> FrozenSet[str]:
+	"""
+	Split text into the set of lowercase words it contains. Cached since
+	decks tend to reuse the same answers.
+	"""
+	return frozenset(TOKEN.findall(text.lower()))
+
+
+class SearchIndex:
+	"""
+	Keeps the lowercased words of a set of cards in a sorted list for prefix
+	lookups with bisect, and an inverted index from answer tokens to the cards
+	whose answers contain them.
+	"""
+
+	def __init__(self, cards: Iterable[QuizItem] = ()):
+		# Sorted (lowercased word, insertion number) pairs and the matching
+		# cards. The insertion number keeps the pairs unique and orderable.
+		self.words: List[tuple] = []
+		self.word_cards: List[QuizItem] = []
+		self.postings: Dict[str, Set[QuizItem]] = {}
+		# What each card was indexed under, so it can be found again after an edit
+		self.indexed_word: Dict[QuizItem, tuple] = {}
+		self.indexed_tokens: Dict[QuizItem, FrozenSet[str]] = {}
+		self.count = 0
+
+		entries = []
+		for card in cards:
+			entries.append(((card.word.lower(), self.count), card))
+			self.indexed_word[card] = entries[-1][0]
+			self.count += 1
+			self._add_tokens(card)
+		entries.sort(key=lambda entry: entry[0])
+		self.words = [key for key, _ in entries]
+		self.word_cards = [card for _, card in entries]
+
+	def __contains__(self, card: QuizItem) -> bool:
+		return card in self.indexed_word
+
+	def add(self, card: QuizItem):
+		"""
+		Index a new card
+		"""
+		self._add_word(card)
+		self._add_tokens(card)
+
+	def update(self, card: QuizItem, attribute: str):
+		"""
+		Re-index a card after its word or answer changed
+		"""
+		if card not in self.indexed_word:
+			return
+		if attribute == "word":
+			key = self.indexed_word.pop(card)
+			idx = bisect_left(self.words, key)
+			del self.words[idx]
+			del self.word_cards[idx]
+			self._add_word(card)
+		elif attribute == "answer":
+			for token in self.indexed_tokens.pop(card):
+				self.postings[token].discard(card)
+			self._add_tokens(card)
+
+	def remove(self, card: QuizItem):
+		"""
+		Stop indexing a card
+		"""
+		if card not in self.indexed_word:
+			return
+		key = self.indexed_word.pop(card)
+		idx = bisect_left(self.words, key)
+		del self.words[idx]
+		del self.word_cards[idx]
+		for token in self.indexed_tokens.pop(card):
+			self.postings[token].discard(card)
+
+	def _add_word(self, card: QuizItem):
+		key = (card.word.lower(), self.count)
+		self.count += 1
+		idx = bisect_left(self.words, key)
+		self.words.insert(idx, key)
+		self.word_cards.insert(idx, card)
+		self.indexed_word[card] = key
+
+	def _add_tokens(self, card: QuizItem):
+		tokens = tokenize(card.answer)
+		postings = self.postings
+		for token in tokens:
+			if token in postings:
+				postings[token].add(card)
+			else:
+				postings[token] = {card}
+		self.indexed_tokens[card] = tokens
+
+	def prefix_range(self, prefix: str) -> Tuple[int, int]:
+		"""
+		Start and end positions in the sorted word list of the words starting
+		with prefix, ignoring case
+		"""
+		prefix = prefix.lower()
+		start = bisect_left(self.words, (prefix,))
+		end = bisect_left(self.words, (prefix + "\U0010ffff",), start)
+		return start, end
+
+	def with_prefix(self, prefix: str) -> List[QuizItem]:
+		"""
+		Cards whose word starts with prefix, ignoring case, in word order
+		"""
+		start, end = self.prefix_range(prefix)
+		return self.word_cards[start:end]
+
+	def containing(self, text: str) -> Set[QuizItem]:
+		"""
+		Cards whose answer contains every word in text, ignoring case
+		"""
+		tokens = sorted(tokenize(text), key=lambda token: len(self.postings.get(token, ())))
+		if not tokens:
+			return set()
+		matches = set(self.postings.get(tokens[0], ()))
+		for token in tokens[1:]:
+			if not matches:
+				break
+			matches &= self.postings.get(token, set())
+		return matches
@@ -0,0 +1,209 @@
+"""
+Rough benchmarks for the PyQuizMaster data structures
+
+Run with `python benchmarks.py` from this directory.
+"""
+
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from QuizItem import QuizItem
+from Deck import Deck
+from ColumnarDeck import ColumnarDeck
+from Scheduler import Scheduler
+
+
+def make_cards(n_cards: int, n_answers: int = 5000):
+	"""
+	Generate vocab-style cards where many words share the same answer
+	"""
+	for i in range(n_cards):
+		yield QuizItem(f"word{i}", f"answer number {i % n_answers}")
+
+
+def peak_memory(build) -> int:
+	"""
+	Measure the memory still held by the object that build() returns
+	"""
+	tracemalloc.start()
+	deck = build()
+	current, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	del deck
+	return current
+
+
+def bench_memory(n_cards: int = 200_000):
+	"""
+	Compare the memory footprint of Deck's list of QuizItems with ColumnarDeck
+	"""
+	list_bytes = peak_memory(lambda: Deck(list(make_cards(n_cards)), load_item=False))
+	columnar_bytes = peak_memory(lambda: ColumnarDeck(make_cards(n_cards), load_item=False))
+	print(f"Memory for {n_cards} cards")
+	print(f"  Deck         : {list_bytes / n_cards:8.1f} bytes/card")
+	print(f"  ColumnarDeck : {columnar_bytes / n_cards:8.1f} bytes/card")
+
+
+def bench_sort_views(n_cards: int = 200_000, n_views: int = 20):
+	"""
+	Time switching back and forth between difficulty and date_edited views
+	of a deck, answering a question between each switch
+	"""
+	cards = list(make_cards(n_cards))
+	for card in cards:
+		for _ in range(random.randint(0, 5)):
+			card.update_difficulty(False)
+	deck = Deck(cards, load_item=False)
+
+	start = time.perf_counter()
+	for view in range(n_views):
+		deck.sort_by(["difficulty", "date_edited"] if view % 2 else "date_edited")
+		random.choice(cards).update_difficulty(False)
+	elapsed = time.perf_counter() - start
+	print(f"Sorting {n_cards} cards")
+	print(f"  {1000 * elapsed / n_views:8.2f} ms/view")
+
+
+def timed(func) -> float:
+	"""
+	Wall clock seconds taken by func()
+	"""
+	start = time.perf_counter()
+	func()
+	return time.perf_counter() - start
+
+
+def card_fields(card: QuizItem) -> tuple:
+	"""
+	Every saved attribute of a card, for comparing decks
+	"""
+	return (card.word, card.answer, card.difficulty, card.date_created, card.date_edited)
+
+
+def bench_snapshot(n_cards: int = 1_000_000):
+	"""
+	Compare loading a deck from the CSV file with loading a binary snapshot
+	"""
+	deck = Deck(list(make_cards(n_cards)), load_item=False)
+	with tempfile.TemporaryDirectory() as tmp:
+		csv_file = os.path.join(tmp, "deck.csv")
+		snapshot_file = os.path.join(tmp, "deck.pqm")
+		deck.save(csv_file)
+		deck.save_snapshot(snapshot_file)
+
+		csv_time = timed(lambda: Deck(load_item=False).load(csv_file))
+		snapshot_time = timed(lambda: Deck(load_item=False).load_snapshot(snapshot_file))
+		columnar_time = timed(
+			lambda: ColumnarDeck(load_item=False).load_snapshot(snapshot_file)
+		)
+
+		# Every field of every card has to survive the round trip
+		expected = [card_fields(card) for card in deck]
+		for deck_class in (Deck, ColumnarDeck):
+			round_trip = deck_class(load_item=False)
+			round_trip.load_snapshot(snapshot_file)
+			assert [card_fields(card) for card in round_trip] == expected, deck_class.__name__
+
+	print(f"Loading {n_cards} cards")
+	print(f"  Deck from CSV               : {csv_time:8.2f} s")
+	print(f"  Deck from snapshot          : {snapshot_time:8.2f} s")
+	print(f"  ColumnarDeck from snapshot  : {columnar_time:8.2f} s")
+	assert csv_time >= 10 * snapshot_time, (
+		f"Deck snapshot load is only {csv_time / snapshot_time:.1f}x faster than CSV"
+	)
+
+
+def bench_scheduler(n_cards: int = 1_000_000, n_questions: int = 10_000):
+	"""
+	Time picking and answering questions with the Scheduler
+	"""
+	deck = Deck(list(make_cards(n_cards)), load_item=False)
+	build_time = timed(lambda: Scheduler(deck))
+	scheduler = Scheduler(deck)
+
+	def answer_questions():
+		for _ in range(n_questions):
+			scheduler.answer(scheduler.next_card(), random.random() < 0.7)
+
+	answer_time = timed(answer_questions)
+	print(f"Scheduling {n_cards} cards")
+	print(f"  build     : {build_time:8.2f} s")
+	print(f"  questions : {1e6 * answer_time / n_questions:8.2f} us/question")
+
+
+def bench_construction(n_cards: int = 200_000):
+	"""
+	Compare the cost of building cards through the validating constructor
+	with the trusted fast paths
+	"""
+	words = [f"word{i}" for i in range(n_cards)]
+	answers = [f"answer number {i % 5000}" for i in range(n_cards)]
+	validated = timed(lambda: [QuizItem(w, a) for w, a in zip(words, answers)])
+	trusted = timed(lambda: [QuizItem.from_trusted(w, a) for w, a in zip(words, answers)])
+	batch = timed(lambda: QuizItem.batch_from_trusted(words, answers))
+	print(f"Constructing {n_cards} cards")
+	print(f"  QuizItem()                  : {1e6 * validated / n_cards:8.2f} us/card")
+	print(f"  QuizItem.from_trusted       : {1e6 * trusted / n_cards:8.2f} us/card")
+	print(f"  QuizItem.batch_from_trusted : {1e6 * batch / n_cards:8.2f} us/card")
+
+
+def bench_search(n_cards: int = 1_000_000, n_queries: int = 1000):
+	"""
+	Time prefix and answer searches on a large deck
+	"""
+	deck = Deck(list(make_cards(n_cards)), load_item=False)
+	build_time = timed(lambda: deck.search(prefix="word0"))
+	prefixes = [f"word{random.randrange(n_cards)}" for _ in range(n_queries)]
+	answers = [f"number {random.randrange(5000)}" for _ in range(n_queries)]
+	prefix_time = timed(lambda: [deck.search(prefix=p) for p in prefixes])
+	contains_time = timed(lambda: [deck.search(contains=a) for a in answers])
+	print(f"Searching {n_cards} cards")
+	print(f"  build    : {build_time:8.2f} s")
+	print(f"  prefix   : {1e6 * prefix_time / n_queries:8.2f} us/query")
+	print(f"  contains : {1e6 * contains_time / n_queries:8.2f} us/query")
+
+
+def bench_merge(sizes=(100_000, 200_000, 400_000)):
+	"""
+	Time merging two overlapping decks with each duplicate policy. The time
+	per card should stay flat as the decks grow.
+	"""
+	print("Merging half-overlapping decks")
+	for n_cards in sizes:
+		for policy in ("reject", "merge", "newest"):
+			# merge and newest change the cards, so every run gets fresh ones
+			first = list(make_cards(n_cards))
+			second = [QuizItem(f"WORD{i}", "another answer") for i in range(n_cards // 2, 3 * n_cards // 2)]
+			deck = Deck(first, load_item=False, duplicates=policy)
+			merge_time = timed(lambda: deck.merge(second))
+			print(f"  {n_cards:8d} cards, {policy:6s} : {1e6 * merge_time / n_cards:8.2f} us/card")
+
+
+def bench_load_many(n_files: int = 64, cards_per_file: int = 20_000, workers=(1, 2, 4, 8)):
+	"""
+	Time loading many deck files with different numbers of worker processes
+	"""
+	with tempfile.TemporaryDirectory() as tmp:
+		files = []
+		for i in range(n_files):
+			files.append(os.path.join(tmp, f"deck{i}.csv"))
+			Deck(list(make_cards(cards_per_file)), load_item=False).save(files[-1])
+
+		print(f"Loading {n_files} files of {cards_per_file} cards")
+		for n_workers in workers:
+			load_time = timed(lambda: Deck(load_item=False).load_many(files, workers=n_workers))
+			print(f"  {n_workers} workers : {load_time:8.2f} s")
+
+
+if __name__ == "__main__":
+	bench_memory()
+	bench_construction()
+	bench_sort_views()
+	bench_snapshot()
+	bench_scheduler()
+	bench_search()
+	bench_merge()
+	bench_load_many()
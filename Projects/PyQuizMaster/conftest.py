@@ -0,0 +1,9 @@
+"""
+Lets the tests import the modules of this directory the same way the
+modules import each other
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,97 @@
+"""
+Tests for ColumnarDeck
+"""
+
+import os
+import tempfile
+import unittest
+
+from QuizItem import QuizItem
+from Deck import Deck
+from ColumnarDeck import ColumnarDeck
+
+
+def make_cards():
+	return [
+		QuizItem("print", "write text to standard output"),
+		QuizItem("Pow", "raise a number to a power"),
+		QuizItem("len", "number of items in a container"),
+		QuizItem("abs", "absolute value of a number"),
+	]
+
+
+class TestColumnarDeckSearch(unittest.TestCase):
+
+	def assert_same_search(self, **query):
+		deck = Deck(make_cards(), load_item=False)
+		columnar = ColumnarDeck(make_cards(), load_item=False)
+		self.assertEqual(
+			[(card.word, card.answer) for card in columnar.search(**query)],
+			[(card.word, card.answer) for card in deck.search(**query)]
+		)
+
+	def test_prefix(self):
+		self.assert_same_search(prefix="p")
+
+	def test_contains(self):
+		self.assert_same_search(contains="Number")
+
+	def test_prefix_and_contains(self):
+		self.assert_same_search(prefix="P", contains="number")
+
+	def test_everything(self):
+		self.assert_same_search()
+
+	def test_no_match(self):
+		self.assert_same_search(prefix="zzz")
+		self.assert_same_search(contains="")
+
+	def test_search_after_affix(self):
+		columnar = ColumnarDeck(make_cards(), load_item=False)
+		columnar.search(prefix="p")
+		columnar.affix(QuizItem("pass", "do nothing"))
+		self.assertEqual([card.word for card in columnar.search(prefix="p")], ["pass", "Pow", "print"])
+
+
+class TestColumnarDeck(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.file = os.path.join(self.tmp.name, "deck.csv")
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_affix_returns_card(self):
+		columnar = ColumnarDeck(load_item=False)
+		card = QuizItem("print", "write text to standard output")
+		self.assertIs(columnar.affix(card), card)
+		self.assertEqual(len(columnar), 1)
+
+	def test_only_value_based_interface(self):
+		columnar = ColumnarDeck(make_cards(), load_item=False)
+		self.assertNotIsInstance(columnar, Deck)
+		for name in ("remove", "find", "merge"):
+			self.assertFalse(hasattr(columnar, name))
+
+	def test_csv_round_trip(self):
+		cards = make_cards()
+		cards[0].difficulty = 3
+		ColumnarDeck(cards, load_item=False).save(self.file)
+
+		deck = Deck(load_item=False)
+		deck.load(self.file)
+		columnar = ColumnarDeck(load_item=False)
+		columnar.load(self.file)
+		columnar.load_many([self.file], workers=1)
+
+		expected = [(card.word, card.answer, card.difficulty, card.date_created, card.date_edited) for card in cards]
+		for loaded in (list(deck), list(columnar)[:4], list(columnar)[4:]):
+			self.assertEqual(
+				[(card.word, card.answer, card.difficulty, card.date_created, card.date_edited) for card in loaded],
+				expected
+			)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,126 @@
+"""
+Tests for Deck
+"""
+
+import os
+import tempfile
+import unittest
+
+from QuizItem import QuizItem
+from Deck import Deck
+
+
+# Words pandas would read as missing values if asked to
+NA_WORDS = ["None", "NA", "null", "NaN", "n/a"]
+
+
+class TestDeckCSV(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.file = os.path.join(self.tmp.name, "deck.csv")
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_na_words_load_as_strings(self):
+		cards = [QuizItem(word, f"answer {word}") for word in NA_WORDS]
+		cards.append(QuizItem("blank", ""))
+		Deck(cards, load_item=False).save(self.file)
+
+		deck = Deck(load_item=False)
+		deck.load(self.file)
+		self.assertEqual([card.word for card in deck], NA_WORDS + ["blank"])
+		self.assertEqual(deck.cards[-1].answer, "")
+		for card in deck:
+			self.assertIsInstance(card.word, str)
+			self.assertIsInstance(card.answer, str)
+		self.assertEqual([card.word for card in deck.search(prefix="n")], sorted(NA_WORDS, key=str.lower))
+
+		deck.save(self.file)
+		reloaded = Deck(load_item=False)
+		reloaded.load(self.file)
+		self.assertEqual(
+			[(card.word, card.answer) for card in reloaded],
+			[(card.word, card.answer) for card in deck]
+		)
+
+	def test_load_many_na_words_load_as_strings(self):
+		cards = [QuizItem(word, f"answer {word}") for word in NA_WORDS]
+		cards.append(QuizItem("blank", ""))
+		Deck(cards, load_item=False).save(self.file)
+
+		deck = Deck(load_item=False)
+		deck.load_many([self.file, self.file], workers=1)
+		self.assertEqual([card.word for card in deck], 2 * (NA_WORDS + ["blank"]))
+		self.assertEqual(deck.cards[-1].answer, "")
+		for card in deck:
+			self.assertIsInstance(card.word, str)
+			self.assertIsInstance(card.answer, str)
+
+
+class TestDeckSort(unittest.TestCase):
+
+	def test_sort_sees_cards_changed_directly(self):
+		deck = Deck([QuizItem("print", "a"), QuizItem("len", "b")], load_item=False)
+		deck.sort_by("word")
+		added = QuizItem("abs", "c")
+		deck.cards.append(added)
+		deck.sort_by("word")
+		self.assertEqual([card.word for card in deck], ["abs", "len", "print"])
+
+		deck.cards.remove(added)
+		deck.cards[0] = QuizItem("zip", "d")
+		deck.sort_by("word", reverse=True)
+		self.assertEqual([card.word for card in deck], ["zip", "print"])
+
+		deck.affix(QuizItem("map", "e"))
+		deck.cards[0].word = "all"
+		deck.sort_by("word")
+		self.assertEqual([card.word for card in deck], ["all", "map", "print"])
+
+
+class TestDeckRekey(unittest.TestCase):
+	"""
+	Editing a card so it collides with another card in a unique deck
+	"""
+
+	def make_deck(self, duplicates: str) -> Deck:
+		deck = Deck(load_item=False, duplicates=duplicates)
+		deck.sort_by("word")
+		deck.affix(QuizItem("print", "write to stdout", difficulty=2))
+		deck.affix(QuizItem("len", "length of a sequence", difficulty=3))
+		return deck
+
+	def test_reject_refuses_edit(self):
+		deck = self.make_deck("reject")
+		card = deck.find("len")
+		with self.assertRaises(ValueError):
+			card.word = " Print"
+		self.assertEqual(card.word, "len")
+		self.assertEqual(deck.find("print").answer, "write to stdout")
+		self.assertIs(deck.find("len"), card)
+		self.assertEqual([card.word for card in deck.search(prefix="p")], ["print"])
+
+	def test_merge_folds_edited_card(self):
+		deck = self.make_deck("merge")
+		existing = deck.find("print")
+		deck.find("len").word = "PRINT"
+		self.assertEqual(deck.cards, [existing])
+		self.assertEqual(existing.difficulty, 5)
+		self.assertIs(deck.find("print"), existing)
+		self.assertIsNone(deck.find("len"))
+		self.assertEqual(deck.sort_by("word", in_place=False).cards, [existing])
+		self.assertEqual(deck.search(prefix="p"), [existing])
+
+	def test_newest_keeps_edited_card(self):
+		deck = self.make_deck("newest")
+		card = deck.find("len")
+		card.word = "print"
+		self.assertEqual(deck.cards, [card])
+		self.assertIs(deck.find("print"), card)
+		self.assertEqual(deck.search(prefix="p"), [card])
+
+
+if __name__ == "__main__":
+	unittest.main()
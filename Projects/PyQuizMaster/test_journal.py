@@ -0,0 +1,106 @@
+"""
+Tests for the Deck journal
+"""
+
+import os
+import tempfile
+import unittest
+
+from QuizItem import QuizItem
+from Deck import Deck
+from DeckJournal import Journal
+
+
+class TestJournal(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.prefix = os.path.join(self.tmp.name, "deck")
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def make_journal(self, n_cards: int = 3):
+		deck = Deck(load_item=True, journal=Journal(self.prefix))
+		for i in range(n_cards):
+			deck.affix(QuizItem(f"word{i}", f"answer{i}"))
+		deck.journal.close()
+
+	def test_replay_restores_cards(self):
+		self.make_journal()
+		deck = Deck(load_item=True, journal=Journal(self.prefix))
+		self.assertEqual([card.word for card in deck], ["word0", "word1", "word2"])
+		deck.journal.close()
+
+	def test_attach_without_replay_keeps_journal(self):
+		self.make_journal()
+		journal_file = Journal(self.prefix).journal_file(0)
+		size = os.path.getsize(journal_file)
+
+		with self.assertRaises(RuntimeError):
+			Deck(load_item=False, journal=Journal(self.prefix))
+		self.assertEqual(os.path.getsize(journal_file), size)
+
+		deck = Deck(load_item=True, journal=Journal(self.prefix))
+		self.assertEqual(len(deck.cards), 3)
+		deck.journal.close()
+
+	def test_attach_without_replay_to_new_journal(self):
+		deck = Deck([QuizItem("word", "answer")], load_item=False, journal=Journal(self.prefix))
+		deck.journal.close()
+		deck = Deck(load_item=True, journal=Journal(self.prefix))
+		self.assertEqual([card.word for card in deck], ["word"])
+		deck.journal.close()
+
+	def test_torn_last_record_is_dropped(self):
+		self.make_journal()
+		with open(Journal(self.prefix).journal_file(0), "a") as f:
+			f.write('["affix", "half')
+		deck = Deck(load_item=True, journal=Journal(self.prefix))
+		deck.affix(QuizItem("word3", "answer3"))
+		deck.journal.close()
+
+		deck = Deck(load_item=True, journal=Journal(self.prefix))
+		self.assertEqual([card.word for card in deck], ["word0", "word1", "word2", "word3"])
+		deck.journal.close()
+
+	def test_replay_merged_edit(self):
+		deck = Deck(load_item=True, journal=Journal(self.prefix), duplicates="merge")
+		deck.affix(QuizItem("print", "write to stdout", difficulty=2))
+		deck.affix(QuizItem("len", "length of a sequence", difficulty=3))
+		deck.find("len").word = "print"
+		deck.journal.compact()
+		deck.affix(QuizItem("abs", "absolute value"))
+		deck.journal.close()
+
+		deck = Deck(load_item=True, journal=Journal(self.prefix), duplicates="merge")
+		self.assertEqual([(card.word, card.difficulty) for card in deck], [("print", 5), ("abs", 0)])
+		deck.journal.close()
+
+		deck = Deck(load_item=True, journal=Journal(self.prefix), duplicates="allow")
+		self.assertEqual([(card.word, card.difficulty) for card in deck], [("print", 5), ("abs", 0)])
+		deck.journal.close()
+
+	def test_replay_after_unwritten_compaction(self):
+		deck = Deck(load_item=True, journal=Journal(self.prefix), duplicates="reject")
+		for word in ("a", "b", "c"):
+			deck.affix(QuizItem(word, "answer"))
+		deck.remove(deck.find("a"))
+		# Die before the background snapshot for the new generation is written
+		deck.journal._write_snapshot = lambda generation, columns: None
+		deck.journal.compact()
+		deck.find("c").answer = "CHANGED"
+		deck.journal.close()
+
+		deck = Deck(load_item=True, journal=Journal(self.prefix), duplicates="reject")
+		self.assertEqual([(card.word, card.answer) for card in deck], [("b", "answer"), ("c", "CHANGED")])
+		deck.find("b").answer = "again"
+		deck.journal.close()
+
+		deck = Deck(load_item=True, journal=Journal(self.prefix))
+		self.assertEqual([(card.word, card.answer) for card in deck], [("b", "again"), ("c", "CHANGED")])
+		deck.journal.close()
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,62 @@
+"""
+Tests for Scheduler
+"""
+
+import datetime
+import unittest
+
+from QuizItem import QuizItem
+from Deck import Deck
+from Scheduler import Scheduler
+
+
+START = datetime.datetime(2020, 6, 1)
+
+
+def make_card(word: str, days_ago: int, difficulty: int = 0) -> QuizItem:
+	date = START - datetime.timedelta(days=days_ago)
+	return QuizItem(word, f"answer {word}", difficulty=difficulty, date_created=date, date_edited=date)
+
+
+class TestScheduler(unittest.TestCase):
+
+	def setUp(self):
+		self.deck = Deck([make_card("abs", 3), make_card("len", 2), make_card("pow", 1)], load_item=False)
+		self.scheduler = Scheduler(self.deck, clock=lambda: START)
+
+	def test_follows_affix_and_remove(self):
+		new_card = self.deck.affix(make_card("print", 10))
+		self.assertEqual(len(self.scheduler), 4)
+		self.assertIs(self.scheduler.next_card(), new_card)
+
+		self.assertTrue(self.deck.remove(new_card))
+		self.assertEqual(len(self.scheduler), 3)
+		self.assertEqual(self.scheduler.next_card().word, "abs")
+
+		self.deck.remove(self.scheduler.next_card())
+		self.assertEqual(self.scheduler.next_card().word, "len")
+
+	def test_remove_keeps_heap_order(self):
+		for i in range(20):
+			self.deck.affix(make_card(f"word{i}", (7 * i) % 20 + 5))
+		for card in list(self.deck)[::3]:
+			self.assertTrue(self.scheduler.remove(card))
+		self.assertFalse(self.scheduler.remove(self.deck.cards[0]))
+
+		asked = []
+		while len(self.scheduler):
+			card = self.scheduler.next_card()
+			asked.append(card.date_edited)
+			self.scheduler.remove(card)
+		self.assertEqual(asked, sorted(asked))
+		self.assertEqual(len(asked), len(self.deck.cards) - len(self.deck.cards[::3]))
+
+	def test_edit_reschedules(self):
+		card = self.scheduler.next_card()
+		self.assertEqual(card.word, "abs")
+		card.answer = "absolute value"
+		self.assertEqual(self.scheduler.next_card().word, "len")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,93 @@
+"""
+Tests for the binary deck snapshot format
+"""
+
+import datetime
+import os
+import tempfile
+import unittest
+
+from QuizItem import QuizItem
+from Deck import Deck
+from ColumnarDeck import ColumnarDeck
+from DeckSnapshot import HEADER, MAGIC, dumps, loads, read_snapshot, to_timestamp, write_snapshot
+
+
+def card_fields(card: QuizItem) -> tuple:
+	return card.word, card.answer, card.difficulty, card.date_created, card.date_edited
+
+
+def make_cards():
+	date = datetime.datetime(2020, 6, 1, 12, 30, 15, 123456)
+	return [
+		QuizItem("print", "write text to standard output", difficulty=2, date_created=date, date_edited=date),
+		QuizItem("naïve", "ünïcödé, 日本語 and emoji 🐍", date_created=date, date_edited=date),
+		QuizItem("", "", difficulty=7, date_created=date, date_edited=date + datetime.timedelta(days=3)),
+		QuizItem("nul\0word", "an answer\0with\0NULs", date_created=date, date_edited=date),
+	]
+
+
+def make_columns(cards) -> dict:
+	return {
+		"word": [card.word for card in cards],
+		"answer": [card.answer for card in cards],
+		"date_created": [to_timestamp(card.date_created) for card in cards],
+		"date_edited": [to_timestamp(card.date_edited) for card in cards],
+		"difficulty": [card.difficulty for card in cards],
+	}
+
+
+class TestSnapshotFormat(unittest.TestCase):
+
+	def assert_round_trip(self, columns: dict):
+		loaded = loads(dumps(columns))
+		self.assertEqual({name: list(values) for name, values in loaded.items()}, columns)
+
+	def test_empty(self):
+		self.assert_round_trip(make_columns([]))
+
+	def test_strings(self):
+		self.assert_round_trip(make_columns(make_cards()[:3]))
+
+	def test_strings_with_nul(self):
+		self.assert_round_trip(make_columns(make_cards()))
+		self.assert_round_trip(make_columns([QuizItem("\0", "\0\0")]))
+
+	def test_rejects_other_files(self):
+		with self.assertRaises(ValueError):
+			loads(HEADER.pack(b"NOPE", 1, 0))
+		with self.assertRaises(ValueError):
+			loads(HEADER.pack(MAGIC, 99, 0))
+
+
+class TestDeckSnapshot(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.file = os.path.join(self.tmp.name, "deck.pqm")
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_empty_file(self):
+		write_snapshot(self.file, make_columns([]))
+		for use_mmap in (True, False):
+			self.assertEqual(read_snapshot(self.file, use_mmap)["word"], [])
+		for deck_class in (Deck, ColumnarDeck):
+			deck = deck_class(load_item=False)
+			deck.load_snapshot(self.file)
+			self.assertEqual(len(list(deck)), 0)
+
+	def test_deck_round_trips(self):
+		expected = [card_fields(card) for card in make_cards()]
+		for save_class in (Deck, ColumnarDeck):
+			save_class(make_cards(), load_item=False).save_snapshot(self.file)
+			for load_class in (Deck, ColumnarDeck):
+				for use_mmap in (True, False):
+					deck = load_class(load_item=False)
+					deck.load_snapshot(self.file, use_mmap)
+					self.assertEqual([card_fields(card) for card in deck], expected)
+
+
+if __name__ == "__main__":
+	unittest.main()